@@ -14,13 +14,15 @@ const { screen } = require('electron');
 const path = require('path');
 const fs = require('fs');
 const sharp = require('sharp');
-const { execFile } = require('child_process');
+const { spawn } = require('child_process');
 const ModelSwitch = require('./ModelSwitch');
 const PersistentMemory = require('./PersistentMemory');
 
 // Path to Python venv and YOLO detection script
 const YOLO_PYTHON = path.join(__dirname, 'yolo_venv', 'bin', 'python3');
 const YOLO_SCRIPT = path.join(__dirname, 'yolo_detect.py');
+const YOLO_TIMEOUT_MS = 30000;
+const YOLO_STARTUP_TIMEOUT_MS = 600000;
 
 // ============================================================
 // SoM Tools — LLM selects element by ID (deterministic) or requests visual fallback
@@ -189,6 +191,11 @@ class ScreenAgent {
         // For complex future scenarios, see AxExtractionAgent.js.future
         const SimpleAxAgent = require('./SimpleAxAgent');
         this.axAgent = new SimpleAxAgent();
+
+        // Resident YOLO worker (spawned on first detection)
+        this.yoloWorker = null;
+        this.yoloPending = new Map();
+        this.yoloNextId = 1;
     }
 
     /**
@@ -757,56 +764,127 @@ CONTEXTO DE VENTANAS:
      * Returns parsed JSON with elements and optional SoM overlay path.
      */
     async _runYoloDetection(screenshotPath) {
-        return new Promise((resolve) => {
-            if (!fs.existsSync(this.debugDir)) fs.mkdirSync(this.debugDir, { recursive: true });
-            const somPath = path.join(this.debugDir, `som_${Date.now()}.png`);
+        if (!fs.existsSync(this.debugDir)) fs.mkdirSync(this.debugDir, { recursive: true });
+        const somPath = path.join(this.debugDir, `som_${Date.now()}.png`);
+
+        let result;
+        try {
+            result = await this._yoloRequest({ image: screenshotPath, confidence: 0.3, som: somPath });
+            if (result.error) throw new Error(result.error);
+        } catch (err) {
+            console.error('❌ [ScreenAgent] YOLO detection failed:', err.message);
+            return { elements: [], image_size: { width: this.screenWidth, height: this.screenHeight } };
+        }
 
-            const args = [YOLO_SCRIPT, screenshotPath, '--confidence', '0.3', '--som', somPath];
+        // Normalize YOLO result to match AX format (normalized x,y,w,h)
+        const imgW = result.image_size.width;
+        const imgH = result.image_size.height;
 
-            execFile(YOLO_PYTHON, args, { timeout: 30000, maxBuffer: 1024 * 1024 }, (err, stdout, stderr) => {
-                if (err) {
-                    console.error('❌ [ScreenAgent] YOLO detection failed:', err.message);
-                    if (stderr) console.error('  stderr:', stderr.substring(0, 500));
-                    resolve({ elements: [], image_size: { width: this.screenWidth, height: this.screenHeight } });
-                    return;
+        result.elements = result.elements.map(e => {
+            // Original YOLO bbox is pixel coords {x1, y1, x2, y2}
+            // We need normalized {x, y, w, h}
+            const w = Math.abs(e.bbox.x2 - e.bbox.x1);
+            const h = Math.abs(e.bbox.y2 - e.bbox.y1);
+            const x = e.bbox.x1;
+            const y = e.bbox.y1;
+
+            return {
+                ...e,
+                bbox: {
+                    x: x / imgW,
+                    y: y / imgH,
+                    w: w / imgW,
+                    h: h / imgH,
+                    // Keep original pixel coords for debug/direct if needed, but standard is now normalized
+                    x1: e.bbox.x1, y1: e.bbox.y1, x2: e.bbox.x2, y2: e.bbox.y2
+                },
+                center: {
+                    x: e.center.x,
+                    y: e.center.y
                 }
-                try {
-                    const result = JSON.parse(stdout);
-                    // Normalize YOLO result to match AX format (normalized x,y,w,h)
-                    const imgW = result.image_size.width;
-                    const imgH = result.image_size.height;
-
-                    result.elements = result.elements.map(e => {
-                        // Original YOLO bbox is pixel coords {x1, y1, x2, y2}
-                        // We need normalized {x, y, w, h}
-                        const w = Math.abs(e.bbox.x2 - e.bbox.x1);
-                        const h = Math.abs(e.bbox.y2 - e.bbox.y1);
-                        const x = e.bbox.x1;
-                        const y = e.bbox.y1;
-
-                        return {
-                            ...e,
-                            bbox: {
-                                x: x / imgW,
-                                y: y / imgH,
-                                w: w / imgW,
-                                h: h / imgH,
-                                // Keep original pixel coords for debug/direct if needed, but standard is now normalized
-                                x1: e.bbox.x1, y1: e.bbox.y1, x2: e.bbox.x2, y2: e.bbox.y2
-                            },
-                            center: {
-                                x: e.center.x,
-                                y: e.center.y
-                            }
-                        };
-                    });
+            };
+        });
+
+        return result;
+    }
+
+    /**
+     * Lazily spawn the resident YOLO worker (yolo_detect.py --serve).
+     * The model stays loaded between screenshots; requests and responses are
+     * newline-delimited JSON matched by id.
+     */
+    _getYoloWorker() {
+        if (this.yoloWorker) return this.yoloWorker;
 
-                    resolve(result);
+        const worker = spawn(YOLO_PYTHON, [YOLO_SCRIPT, '--serve'], { stdio: ['pipe', 'pipe', 'pipe'] });
+        let buffer = '';
+
+        worker.stdout.on('data', (chunk) => {
+            buffer += chunk.toString();
+            let newline;
+            while ((newline = buffer.indexOf('\n')) >= 0) {
+                const line = buffer.slice(0, newline).trim();
+                buffer = buffer.slice(newline + 1);
+                if (!line) continue;
+
+                let msg;
+                try {
+                    msg = JSON.parse(line);
                 } catch (parseErr) {
                     console.error('❌ [ScreenAgent] YOLO output parse failed:', parseErr.message);
-                    resolve({ elements: [], image_size: { width: this.screenWidth, height: this.screenHeight } });
+                    continue;
+                }
+                const pending = this.yoloPending.get(msg.id);
+                if (pending) {
+                    this.yoloPending.delete(msg.id);
+                    pending.resolve(msg);
                 }
+            }
+        });
+
+        worker.stderr.on('data', (data) => {
+            console.log(`🔎 [YOLO] ${data.toString().trim().substring(0, 500)}`);
+        });
+
+        worker.on('exit', (code) => {
+            console.warn(`⚠️ [ScreenAgent] YOLO worker exited (code ${code})`);
+            this.yoloWorker = null;
+            for (const pending of this.yoloPending.values()) {
+                pending.reject(new Error(`YOLO worker exited (code ${code})`));
+            }
+            this.yoloPending.clear();
+        });
+
+        worker.on('error', (err) => {
+            console.error('❌ [ScreenAgent] YOLO worker failed to start:', err.message);
+        });
+
+        this.yoloWorker = worker;
+        return worker;
+    }
+
+    /**
+     * Send one detection request to the resident YOLO worker.
+     */
+    _yoloRequest(request) {
+        return new Promise((resolve, reject) => {
+            const fresh = !this.yoloWorker;
+            const worker = this._getYoloWorker();
+            const id = this.yoloNextId++;
+            // The first request also pays for model load (and engine export on first run)
+            const timeoutMs = fresh ? YOLO_STARTUP_TIMEOUT_MS : YOLO_TIMEOUT_MS;
+
+            const timer = setTimeout(() => {
+                this.yoloPending.delete(id);
+                reject(new Error(`YOLO request timed out after ${timeoutMs}ms`));
+            }, timeoutMs);
+
+            this.yoloPending.set(id, {
+                resolve: (msg) => { clearTimeout(timer); resolve(msg); },
+                reject: (err) => { clearTimeout(timer); reject(err); }
             });
+
+            worker.stdin.write(JSON.stringify({ id, ...request }) + '\n');
         });
     }
 
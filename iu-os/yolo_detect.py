@@ -6,6 +6,14 @@ Takes a screenshot image, runs YOLOv11l UI detection, outputs JSON with bounding
 Usage:
     python3 yolo_detect.py /path/to/screenshot.png [--confidence 0.3] [--som /path/to/output_som.png]
 
+On CUDA devices the weights are exported once to a TensorRT engine (INT8 when
+calibration screenshots are cached in .yolo_model_cache/calib/, else FP16).
+
+Resident worker (keeps the model loaded between screenshots):
+    python3 yolo_detect.py --serve
+    stdin:  {"id": 1, "image": "/path/to/screenshot.png", "confidence": 0.3, "som": "/path/to/som.png"}
+    stdout: one JSON response per line, same format as below plus the echoed "id"
+
 Output (stdout JSON):
     {
         "elements": [
@@ -28,6 +36,10 @@ import sys
 import json
 import os
 import argparse
+import functools
+import queue
+import threading
+import time
 from pathlib import Path
 
 # Download model on first run
@@ -35,9 +47,28 @@ MODEL_REPO = "macpaw-research/yolov11l-ui-elements-detection"
 MODEL_FILE = "ui-elements-detection.pt"
 MODEL_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".yolo_model_cache")
 
+# TensorRT engine export (CUDA devices only, e.g. Jetson Orin)
+ENGINE_INT8_FILE = "ui-elements-detection_int8.engine"
+ENGINE_FP16_FILE = "ui-elements-detection_fp16.engine"
+ENGINE_IMGSZ = 640
+CALIB_DIR = os.path.join(MODEL_CACHE, "calib")
+CALIB_MIN_IMAGES = 200  # INT8 calibration needs a representative set of screenshots
 
-def get_model_path():
-    """Download and cache the YOLO model."""
+# Resident worker dynamic batching
+MAX_BATCH = 8        # Max screenshots per predict() call
+MAX_WAIT_MS = 15     # How long to wait for more requests before running a partial batch
+MAX_QUEUE = 32       # Pending requests beyond this are rejected as busy
+
+# SoM overlay
+SOM_FONT_PATH = "/System/Library/Fonts/Helvetica.ttc"
+SOM_COLORS = (
+    "#FF4444", "#44FF44", "#4444FF", "#FFFF44", "#FF44FF",
+    "#44FFFF", "#FF8844", "#88FF44", "#4488FF", "#FF4488",
+)
+
+
+def get_weights_path():
+    """Download and cache the YOLO PyTorch weights."""
     cached = os.path.join(MODEL_CACHE, MODEL_FILE)
     if os.path.exists(cached):
         return cached
@@ -54,25 +85,121 @@ def get_model_path():
     return path
 
 
-def draw_som_overlay(image_path, elements, output_path):
-    """Draw numbered SoM (Set-of-Mark) overlay on the image."""
-    from PIL import Image, ImageDraw, ImageFont
+def _calibration_images():
+    """List the screenshots cached for INT8 calibration."""
+    if not os.path.isdir(CALIB_DIR):
+        return []
+    return [
+        f for f in os.listdir(CALIB_DIR)
+        if f.lower().endswith((".png", ".jpg", ".jpeg"))
+    ]
 
-    img = Image.open(image_path).convert("RGB")
-    draw = ImageDraw.Draw(img)
 
-    # Try to get a readable font
+def _write_calibration_yaml(names):
+    """Write the dataset YAML Ultralytics uses to calibrate the INT8 engine."""
+    calib_yaml = os.path.join(MODEL_CACHE, "calib.yaml")
+    lines = [
+        f"path: {CALIB_DIR}",
+        "train: .",
+        "val: .",
+        "names:",
+    ]
+    lines += [f"  {idx}: {name}" for idx, name in sorted(names.items())]
+    with open(calib_yaml, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return calib_yaml
+
+
+def _export_engine(weights_path):
+    """
+    Export the weights to a TensorRT engine once and cache it next to the .pt.
+
+    INT8 is used on Ampere-or-newer GPUs (Jetson Orin is sm_87) when enough
+    calibration screenshots are cached under MODEL_CACHE/calib/; otherwise an
+    FP16 engine is built. Returns None if no CUDA device is available or the
+    export fails, in which case the PyTorch weights are used.
+    """
     try:
-        font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 14)
-        font_small = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 11)
+        import torch
+    except ImportError:
+        return None
+    if not torch.cuda.is_available():
+        return None
+
+    int8_path = os.path.join(MODEL_CACHE, ENGINE_INT8_FILE)
+    fp16_path = os.path.join(MODEL_CACHE, ENGINE_FP16_FILE)
+    use_int8 = (
+        torch.cuda.get_device_capability(0) >= (8, 0)
+        and len(_calibration_images()) >= CALIB_MIN_IMAGES
+    )
+
+    if os.path.exists(int8_path):
+        return int8_path
+    if not use_int8 and os.path.exists(fp16_path):
+        return fp16_path
+
+    from ultralytics import YOLO
+
+    model = YOLO(weights_path)
+    export_args = dict(format="engine", imgsz=ENGINE_IMGSZ, workspace=4, batch=MAX_BATCH, dynamic=True)
+    if use_int8:
+        export_args.update(int8=True, data=_write_calibration_yaml(model.names))
+        target = int8_path
+    else:
+        export_args.update(half=True)
+        target = fp16_path
+
+    mode = "INT8" if use_int8 else "FP16"
+    print(f"⚙️  Exporting TensorRT {mode} engine (first run)...", file=sys.stderr)
+    try:
+        exported = model.export(**export_args)
+        os.replace(exported, target)
+    except Exception as e:
+        print(f"⚠️  TensorRT export failed, using PyTorch weights: {e}", file=sys.stderr)
+        return None
+
+    print(f"✅ Engine cached at {target}", file=sys.stderr)
+    return target
+
+
+def get_model_path():
+    """Return the best available model: a cached TensorRT engine, else the .pt weights."""
+    weights_path = get_weights_path()
+    return _export_engine(weights_path) or weights_path
+
+
+@functools.lru_cache(maxsize=1)
+def _som_font():
+    """Label font, parsed once per process."""
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(SOM_FONT_PATH, 11)
     except Exception:
-        font = ImageFont.load_default()
-        font_small = font
+        return ImageFont.load_default()
 
-    colors = [
-        "#FF4444", "#44FF44", "#4444FF", "#FFFF44", "#FF44FF",
-        "#44FFFF", "#FF8844", "#88FF44", "#4488FF", "#FF4488",
-    ]
+
+@functools.lru_cache(maxsize=256)
+def _label_size(label):
+    """(width, height) of a label in the SoM font; labels repeat across boxes and frames."""
+    from PIL import Image, ImageDraw
+
+    left, top, right, bottom = ImageDraw.Draw(Image.new("RGB", (1, 1))).textbbox((0, 0), label, font=_som_font())
+    return right - left, bottom - top
+
+
+def draw_som_overlay(image, elements, output_path):
+    """
+    Draw numbered SoM (Set-of-Mark) overlay on the image.
+
+    `image` is an already-decoded RGB PIL image (drawn on in place) or a path.
+    """
+    from PIL import Image, ImageDraw
+
+    img = Image.open(image).convert("RGB") if isinstance(image, (str, os.PathLike)) else image
+    draw = ImageDraw.Draw(img)
+    font_small = _som_font()
+    colors = SOM_COLORS
 
     for elem in elements:
         idx = elem["id"]
@@ -85,8 +212,7 @@ def draw_som_overlay(image_path, elements, output_path):
 
         # Draw label background + number
         label = f"#{idx} {elem['label']}"
-        text_bbox = draw.textbbox((0, 0), label, font=font_small)
-        tw, th = text_bbox[2] - text_bbox[0], text_bbox[3] - text_bbox[1]
+        tw, th = _label_size(label)
         label_y = max(0, y1 - th - 4)
         draw.rectangle([x1, label_y, x1 + tw + 6, label_y + th + 4], fill=color)
         draw.text((x1 + 3, label_y + 2), label, fill="white", font=font_small)
@@ -95,64 +221,71 @@ def draw_som_overlay(image_path, elements, output_path):
     return output_path
 
 
-def detect(image_path, confidence=0.3, som_output=None):
-    """Run YOLO detection on the image and return structured results."""
+def load_model():
+    """Load the YOLO model once and warm it up so the first real request is fast."""
+    import numpy as np
     from ultralytics import YOLO
-    from PIL import Image
-
-    model_path = get_model_path()
-    model = YOLO(model_path)
 
-    # Get image dimensions
-    img = Image.open(image_path)
-    img_w, img_h = img.size
-
-    # Run prediction
-    results = model.predict(
-        source=image_path,
-        conf=confidence,
-        verbose=False,
-    )
-
-    elements = []
-    if results and len(results) > 0:
-        result = results[0]
-        boxes = result.boxes
-
-        for i, box in enumerate(boxes):
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            conf = float(box.conf[0])
-            cls_id = int(box.cls[0])
-            label = result.names[cls_id]
-
-            cx = (x1 + x2) / 2
-            cy = (y1 + y2) / 2
-
-            elements.append({
-                "id": i + 1,
-                "label": label,
-                "confidence": round(conf, 3),
-                "bbox": {
-                    "x1": round(x1),
-                    "y1": round(y1),
-                    "x2": round(x2),
-                    "y2": round(y2),
-                },
-                "center": {
-                    "x": round(cx),
-                    "y": round(cy),
-                },
-                "center_norm": {
-                    "x": round(cx / img_w, 4),
-                    "y": round(cy / img_h, 4),
-                },
-            })
-
-    # Sort by position (top-to-bottom, left-to-right)
-    elements.sort(key=lambda e: (e["bbox"]["y1"], e["bbox"]["x1"]))
-    # Re-assign IDs after sorting
-    for i, elem in enumerate(elements):
-        elem["id"] = i + 1
+    model = YOLO(get_model_path(), task="detect")
+    model.predict(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    return model
+
+
+def _build_output(result, img_w, img_h, confidence, image, som_output):
+    """Convert one Ultralytics result into the JSON output format."""
+    import numpy as np
+
+    boxes = result.boxes
+    names = result.names
+
+    # Three bulk device->host copies instead of one per box. Widened to
+    # float64 so the arithmetic matches Python floats (what .tolist() gave)
+    xyxy = boxes.xyxy.cpu().numpy().astype(np.float64)
+    confs = boxes.conf.cpu().numpy().astype(np.float64)
+    clss = boxes.cls.cpu().numpy().astype(int)
+
+    keep = confs >= confidence
+    xyxy, confs, clss = xyxy[keep], confs[keep], clss[keep]
+
+    # Sort by position (top-to-bottom, left-to-right) on the rounded pixel
+    # coordinates; lexsort is stable, so ties keep detection order
+    xyxy_i = np.rint(xyxy).astype(int)
+    order = np.lexsort((xyxy_i[:, 0], xyxy_i[:, 1]))
+    xyxy, xyxy_i, confs, clss = xyxy[order], xyxy_i[order], confs[order], clss[order]
+
+    cx = (xyxy[:, 0] + xyxy[:, 2]) * 0.5
+    cy = (xyxy[:, 1] + xyxy[:, 3]) * 0.5
+    xyxy_r = xyxy_i.tolist()
+    cx_r = np.rint(cx).astype(int).tolist()
+    cy_r = np.rint(cy).astype(int).tolist()
+    # Python round() gives the shortest decimal (0.866, not 0.8659999966621399)
+    cxn = [round(v, 4) for v in (cx / img_w).tolist()]
+    cyn = [round(v, 4) for v in (cy / img_h).tolist()]
+    confs_r = [round(v, 3) for v in confs.tolist()]
+    labels = [names[c] for c in clss.tolist()]
+
+    elements = [
+        {
+            "id": i + 1,
+            "label": labels[i],
+            "confidence": confs_r[i],
+            "bbox": {
+                "x1": xyxy_r[i][0],
+                "y1": xyxy_r[i][1],
+                "x2": xyxy_r[i][2],
+                "y2": xyxy_r[i][3],
+            },
+            "center": {
+                "x": cx_r[i],
+                "y": cy_r[i],
+            },
+            "center_norm": {
+                "x": cxn[i],
+                "y": cyn[i],
+            },
+        }
+        for i in range(len(labels))
+    ]
 
     output = {
         "elements": elements,
@@ -161,24 +294,193 @@ def detect(image_path, confidence=0.3, som_output=None):
 
     # Generate SoM overlay if requested
     if som_output:
-        draw_som_overlay(image_path, elements, som_output)
+        draw_som_overlay(image, elements, som_output)
         output["som_image"] = som_output
 
     return output
 
 
+def detect_batch(model, requests):
+    """
+    Run YOLO detection on several images in a single predict() call.
+
+    Args:
+        requests: list of (image_path, confidence, som_output) tuples
+
+    Returns:
+        One entry per request, in order: its output dict, or the exception
+        raised while decoding its image or building its output (the other
+        requests are unaffected). The batch runs at the lowest requested
+        confidence; each output is then filtered to its own threshold.
+    """
+    from PIL import Image
+
+    # Decode each screenshot once; predict() and the SoM overlay share it.
+    # PIL images (not raw arrays) so Ultralytics handles the RGB->BGR order.
+    outputs = [None] * len(requests)
+    decoded = []  # (index, image)
+    for i, (image_path, _, _) in enumerate(requests):
+        try:
+            decoded.append((i, Image.open(image_path).convert("RGB")))
+        except Exception as e:
+            outputs[i] = e
+
+    if not decoded:
+        return outputs
+
+    images = [img for _, img in decoded]
+    results = model.predict(
+        source=images,
+        conf=min(requests[i][1] for i, _ in decoded),
+        batch=len(images),
+        verbose=False,
+    )
+
+    for (i, img), result in zip(decoded, results):
+        _, confidence, som_output = requests[i]
+        img_w, img_h = img.size
+        try:
+            outputs[i] = _build_output(result, img_w, img_h, confidence, img, som_output)
+        except Exception as e:
+            outputs[i] = e
+    return outputs
+
+
+def detect(model, image_path, confidence=0.3, som_output=None):
+    """Run YOLO detection on the image and return structured results."""
+    output = detect_batch(model, [(image_path, confidence, som_output)])[0]
+    if isinstance(output, Exception):
+        raise output
+    return output
+
+
+def _emit(response, lock):
+    """Write one JSON response line to stdout."""
+    with lock:
+        print(json.dumps(response), flush=True)
+
+
+def _validate_request(request):
+    """Return an error message for a malformed request, or None if it can be served."""
+    if not isinstance(request, dict):
+        return "Invalid request: expected a JSON object"
+
+    image = request.get("image")
+    if not isinstance(image, str) or not image or not os.path.exists(image):
+        return f"Image not found: {image}"
+
+    confidence = request.get("confidence", 0.3)
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+        return f"Invalid confidence: {confidence!r}"
+
+    som = request.get("som")
+    if som is not None and not isinstance(som, str):
+        return f"Invalid som path: {som!r}"
+    return None
+
+
+def _read_requests(pending, lock):
+    """Stdin reader thread: parse requests and enqueue them, rejecting when the queue is full."""
+    try:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                _emit({"error": f"Invalid request: {e}"}, lock)
+                continue
+
+            error = _validate_request(request)
+            if error:
+                request_id = request.get("id") if isinstance(request, dict) else None
+                _emit({"id": request_id, "error": error}, lock)
+                continue
+
+            try:
+                pending.put_nowait(request)
+            except queue.Full:
+                _emit({"id": request.get("id"), "error": "busy", "status": 429}, lock)
+    finally:
+        pending.put(None)  # EOF (or reader failure): let serve() finish instead of blocking
+
+
+def _next_batch(pending):
+    """Block for one request, then coalesce whatever else arrives within MAX_WAIT_MS."""
+    first = pending.get()
+    if first is None:
+        return None, True
+
+    batch = [first]
+    deadline = time.monotonic() + MAX_WAIT_MS / 1000
+    while len(batch) < MAX_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            request = pending.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if request is None:
+            return batch, True
+        batch.append(request)
+    return batch, False
+
+
+def serve(model):
+    """
+    Resident worker loop: one JSON request per stdin line, one JSON response per stdout line.
+
+    Request:  {"id": 1, "image": "/path.png", "confidence": 0.3, "som": "/out.png"}
+    Response: the detect() output (or {"error": ...}) with the request "id" echoed back.
+
+    Requests arriving within MAX_WAIT_MS of each other are batched into one
+    predict() call (up to MAX_BATCH). At most MAX_QUEUE requests may be
+    pending; beyond that they are rejected with {"error": "busy"}.
+    """
+    lock = threading.Lock()
+    pending = queue.Queue(maxsize=MAX_QUEUE)
+    reader = threading.Thread(target=_read_requests, args=(pending, lock), daemon=True)
+    reader.start()
+
+    print("✅ YOLO worker ready", file=sys.stderr)
+    done = False
+    while not done:
+        batch, done = _next_batch(pending)
+        if not batch:
+            continue
+
+        args = [(r["image"], r.get("confidence", 0.3), r.get("som")) for r in batch]
+        try:
+            responses = detect_batch(model, args)
+        except Exception as e:  # predict() itself failed: the whole batch shares it
+            responses = [e] * len(batch)
+
+        for request, response in zip(batch, responses):
+            if isinstance(response, Exception):
+                response = {"error": str(response)}
+            response["id"] = request.get("id")
+            _emit(response, lock)
+
+
 def main():
     parser = argparse.ArgumentParser(description="YOLO UI Element Detection")
-    parser.add_argument("image", help="Path to screenshot image")
+    parser.add_argument("image", nargs="?", help="Path to screenshot image")
     parser.add_argument("--confidence", type=float, default=0.3, help="Confidence threshold (0-1)")
     parser.add_argument("--som", help="Path to save SoM overlay image")
+    parser.add_argument("--serve", action="store_true", help="Run as a resident worker reading JSON requests from stdin")
     args = parser.parse_args()
 
-    if not os.path.exists(args.image):
+    if args.serve:
+        serve(load_model())
+        return
+
+    if not args.image or not os.path.exists(args.image):
         print(json.dumps({"error": f"Image not found: {args.image}"}))
         sys.exit(1)
 
-    result = detect(args.image, confidence=args.confidence, som_output=args.som)
+    result = detect(load_model(), args.image, confidence=args.confidence, som_output=args.som)
     print(json.dumps(result))
 
 
@@ -0,0 +1,179 @@
+"""
+Compiled BFS pathfinder for the HRM service fallback.
+
+bfs_solve_flat() runs over a flattened int8 grid (0 = wall) and returns the
+shortest path as flat cell indices; extract_path_flat() follows the path
+cells marked in an HRM output grid. Both are compiled with Numba when
+available, against explicit signatures (cached on disk, so only the very
+first run pays compile time) and without holding the GIL, so the event
+loop keeps serving frames while the inference thread searches; without
+Numba HAS_NUMBA is False and hrm_service uses its SciPy / pure-Python code
+instead.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in so the module still imports without Numba."""
+        def wrap(fn):
+            return fn
+        return wrap
+
+
+WALL = 0
+PATH = 1
+TARGET = 3
+
+# grid (C-contiguous int8), start, target, width, height -> flat path indices
+_SIGNATURE = "int32[:](int8[::1], int64, int64, int64, int64)"
+
+
+@njit(_SIGNATURE, cache=True, nogil=True)
+def bfs_solve_flat(grid, start, target, width, height):
+    """
+    Shortest 4-connected path from start to target.
+
+    Args:
+        grid: Flattened (height * width) int8 grid, 0 = wall
+        start: Flat index of the start cell
+        target: Flat index of the target cell
+        width: Grid width
+        height: Grid height
+
+    Returns:
+        int32 array of flat cell indices from start to target (empty if unreachable)
+    """
+    size = width * height
+    visited = np.zeros(size, dtype=np.uint8)
+    parent = np.full(size, -1, dtype=np.int32)
+    # Every cell enters the queue at most once, so a flat array is enough
+    queue = np.empty(size, dtype=np.int32)
+
+    for i in range(size):
+        if grid[i] == WALL:
+            visited[i] = 1
+    visited[start] = 1
+    queue[0] = start
+    head = 0
+    tail = 1
+    found = start == target
+
+    while head < tail and not found:
+        idx = queue[head]
+        head += 1
+        col = idx % width
+
+        for k in range(4):
+            if k == 0:
+                neighbor = idx - width
+                if neighbor < 0:
+                    continue
+            elif k == 1:
+                neighbor = idx + width
+                if neighbor >= size:
+                    continue
+            elif k == 2:
+                if col == 0:
+                    continue
+                neighbor = idx - 1
+            else:
+                if col == width - 1:
+                    continue
+                neighbor = idx + 1
+
+            if visited[neighbor]:
+                continue
+            visited[neighbor] = 1
+            parent[neighbor] = idx
+            if neighbor == target:
+                found = True
+                break
+            queue[tail] = neighbor
+            tail += 1
+
+    if not found:
+        return np.empty(0, dtype=np.int32)
+
+    # Walk parent pointers back to the start
+    length = 1
+    idx = target
+    while idx != start:
+        idx = parent[idx]
+        length += 1
+    path = np.empty(length, dtype=np.int32)
+    idx = target
+    for i in range(length - 1, -1, -1):
+        path[i] = idx
+        idx = parent[idx]
+    return path
+
+
+@njit(_SIGNATURE, cache=True, nogil=True)
+def extract_path_flat(output, start, target, width, height):
+    """
+    Follow PATH / TARGET cells of an HRM output grid from start to target,
+    taking the first unvisited marked neighbour (up, down, left, right).
+
+    Returns:
+        int32 array of flat cell indices from start to target (empty if the
+        marked cells don't connect them)
+    """
+    size = width * height
+    visited = np.zeros(size, dtype=np.uint8)
+    path = np.empty(size, dtype=np.int32)
+
+    idx = start
+    visited[idx] = 1
+    path[0] = idx
+    length = 1
+
+    while idx != target:
+        col = idx % width
+        nxt = -1
+
+        for k in range(4):
+            if k == 0:
+                neighbor = idx - width
+                if neighbor < 0:
+                    continue
+            elif k == 1:
+                neighbor = idx + width
+                if neighbor >= size:
+                    continue
+            elif k == 2:
+                if col == 0:
+                    continue
+                neighbor = idx - 1
+            else:
+                if col == width - 1:
+                    continue
+                neighbor = idx + 1
+
+            if visited[neighbor]:
+                continue
+            if output[neighbor] == PATH or output[neighbor] == TARGET or neighbor == target:
+                nxt = neighbor
+                break
+
+        if nxt < 0:
+            return np.empty(0, dtype=np.int32)  # Path incomplete
+
+        idx = nxt
+        visited[idx] = 1
+        path[length] = idx
+        length += 1
+
+    return path[:length]
+
+
+def warmup():
+    """Load the cached kernels (compiled at import) and run them on a tiny grid."""
+    grid = np.ones(16, dtype=np.int8)
+    bfs_solve_flat(grid, 0, 15, 4, 4)
+    extract_path_flat(grid, 0, 15, 4, 4)
@@ -9,12 +9,85 @@ imports, and any code that tries to 'from flash_attn import ...'
 will use this native PyTorch implementation.
 """
 
+import contextlib
+import functools
+import logging
+import os
+
 import torch
 import torch.nn.functional as F
 from typing import Optional, Tuple
 
 __version__ = "2.8.3-compat"  # Fake version for compatibility checks
 
+# Restrict SDPA to the fused kernels (math only as a last resort) so the
+# N x N score matrix is never materialized when a fused kernel can run.
+try:
+    from torch.nn.attention import sdpa_kernel, SDPBackend
+    _SDPA_BACKENDS = [SDPBackend.FLASH_ATTENTION, SDPBackend.EFFICIENT_ATTENTION, SDPBackend.MATH]
+except ImportError:  # PyTorch < 2.3
+    sdpa_kernel = None
+
+# Lower-precision reductions in the math fallback cut its peak memory
+if hasattr(torch.backends.cuda, "allow_fp16_bf16_reduction_math_sdp"):
+    torch.backends.cuda.allow_fp16_bf16_reduction_math_sdp(True)
+
+
+def _sdpa_context():
+    """Context manager selecting the preferred SDPA backends."""
+    if sdpa_kernel is None:
+        return contextlib.nullcontext()
+    return sdpa_kernel(_SDPA_BACKENDS)
+
+
+logger = logging.getLogger(__name__)
+
+# Set FLASH_ATTN_COMPAT_DEBUG=1 to log which SDPA backend each layout dispatches to
+_DEBUG_BACKEND = os.environ.get("FLASH_ATTN_COMPAT_DEBUG") == "1"
+
+
+def _to_sdpa_layout(x: torch.Tensor) -> torch.Tensor:
+    """
+    (batch, seqlen, heads, dim) -> (batch, heads, seqlen, dim) as a view.
+    The fused kernels only need a unit stride on the last dim, so a copy is
+    made only when the caller hands in a tensor without one.
+    """
+    x = x.transpose(1, 2)
+    if x.stride(-1) != 1:
+        x = x.contiguous()
+    return x
+
+
+@functools.lru_cache(maxsize=64)
+def _log_backend_once(shape, stride, dtype, backend):
+    logger.info(f"SDPA backend {backend} for shape={shape} stride={stride} dtype={dtype}")
+
+
+def _log_sdpa_backend(q: torch.Tensor, k: torch.Tensor, v: torch.Tensor, causal: bool):
+    """Debug helper: report the backend PyTorch picks, once per layout."""
+    if not hasattr(torch, "_fused_sdp_choice"):
+        return
+    choice = torch._fused_sdp_choice(q, k, v, is_causal=causal)
+    backend = SDPBackend(choice).name if sdpa_kernel is not None else str(choice)
+    _log_backend_once(tuple(q.shape), q.stride(), str(q.dtype), backend)
+
+
+@functools.lru_cache(maxsize=None)
+def _supports_bf16_attention(device_index: int) -> bool:
+    """Ampere+ (incl. Orin sm_87) runs the fused kernels in BF16."""
+    return torch.cuda.get_device_capability(device_index) >= (8, 0)
+
+
+def _compute_dtype(x: torch.Tensor) -> torch.dtype:
+    """
+    FP32 inputs fall back to the math kernel; run them in BF16 instead
+    (safer than FP16 for the softmax range) on GPUs with BF16 tensor cores.
+    """
+    if x.is_cuda and x.dtype == torch.float32 and _supports_bf16_attention(x.device.index or 0):
+        return torch.bfloat16
+    return x.dtype
+
+
 def flash_attn_func(
     q: torch.Tensor,
     k: torch.Tensor, 
@@ -38,33 +111,59 @@ def flash_attn_func(
     Returns:
         Output tensor of shape (batch, seqlen_q, num_heads, head_dim)
     """
+    return _sdpa_attention(q, k, v, None, dropout_p, softmax_scale, causal)
+
+
+def _sdpa_attention(
+    q: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    attn_mask: Optional[torch.Tensor],
+    dropout_p: float,
+    softmax_scale: Optional[float],
+    causal: bool
+) -> torch.Tensor:
+    """Run SDPA on flash_attn-layout (batch, seqlen, num_heads, head_dim) tensors."""
     # flash_attn uses (batch, seqlen, num_heads, head_dim)
     # PyTorch SDPA uses (batch, num_heads, seqlen, head_dim)
     
     batch_size, seqlen_q, num_heads, head_dim = q.shape
     
-    # Transpose to PyTorch format
-    q = q.transpose(1, 2)  # (batch, num_heads, seqlen_q, head_dim)
-    k = k.transpose(1, 2)  # (batch, num_heads, seqlen_k, head_dim)
-    v = v.transpose(1, 2)  # (batch, num_heads, seqlen_k, head_dim)
+    orig_dtype = q.dtype
+    compute_dtype = _compute_dtype(q)
+    if compute_dtype != orig_dtype:
+        q, k, v = q.to(compute_dtype), k.to(compute_dtype), v.to(compute_dtype)
+    
+    # Transpose to PyTorch format (views; no copy for the usual strides)
+    q = _to_sdpa_layout(q)  # (batch, num_heads, seqlen_q, head_dim)
+    k = _to_sdpa_layout(k)  # (batch, num_heads, seqlen_k, head_dim)
+    v = _to_sdpa_layout(v)  # (batch, num_heads, seqlen_k, head_dim)
+    
+    if _DEBUG_BACKEND:
+        _log_sdpa_backend(q, k, v, causal)
     
     # Compute scale
     if softmax_scale is None:
         softmax_scale = head_dim ** -0.5
     
     # Use PyTorch's scaled_dot_product_attention (available in PyTorch 2.0+)
-    out = F.scaled_dot_product_attention(
-        q, k, v,
-        attn_mask=None,
-        dropout_p=dropout_p if torch.is_grad_enabled() else 0.0,
-        is_causal=causal,
-        scale=softmax_scale
-    )
-    
-    # Transpose back to flash_attn format
+    with _sdpa_context():
+        out = F.scaled_dot_product_attention(
+            q, k, v,
+            attn_mask=attn_mask,
+            dropout_p=dropout_p if torch.is_grad_enabled() else 0.0,
+            is_causal=causal,
+            scale=softmax_scale
+        )
+    
+    # Transpose back to flash_attn format (SDPA allocates its output so this view is contiguous)
     out = out.transpose(1, 2)  # (batch, seqlen_q, num_heads, head_dim)
     
-    return out
+    return out.to(orig_dtype)
+
+# Pad varlen batches into one SDPA call unless padding would more than
+# double the number of query tokens processed (very skewed lengths).
+VARLEN_MAX_PAD_RATIO = 2.0
 
 
 def flash_attn_varlen_func(
@@ -82,24 +181,75 @@ def flash_attn_varlen_func(
 ) -> torch.Tensor:
     """
     Variable length attention fallback.
-    This is a simplified implementation that doesn't fully support variable lengths.
+    
+    Sequences are packed as q: (total_q, num_heads, head_dim), k/v: (total_k, num_heads, head_dim)
+    with boundaries in cu_seqlens_*. They are scattered into one padded
+    (batch, max_seqlen, num_heads, head_dim) batch and run through a single
+    masked SDPA call, without any host syncs. Causal masking is top-left aligned.
     """
-    # For variable length, we process each sequence separately
-    # This is slower but works correctly
+    batch_size = cu_seqlens_q.shape[0] - 1
+    total_q = q.shape[0]
+    
+    if batch_size * max_seqlen_q > VARLEN_MAX_PAD_RATIO * total_q:
+        return _flash_attn_varlen_loop(
+            q, k, v, cu_seqlens_q, cu_seqlens_k, dropout_p, softmax_scale, causal
+        )
+    
+    device = q.device
+    lens_q = cu_seqlens_q[1:] - cu_seqlens_q[:-1]
+    lens_k = cu_seqlens_k[1:] - cu_seqlens_k[:-1]
+    
+    # (sequence, position) of every packed token; output_size avoids a host sync
+    seq_ids = torch.arange(batch_size, device=device)
+    seq_q = torch.repeat_interleave(seq_ids, lens_q, output_size=total_q)
+    seq_k = torch.repeat_interleave(seq_ids, lens_k, output_size=k.shape[0])
+    pos_q = torch.arange(total_q, device=device) - cu_seqlens_q[seq_q]
+    pos_k = torch.arange(k.shape[0], device=device) - cu_seqlens_k[seq_k]
     
+    q_pad = q.new_zeros(batch_size, max_seqlen_q, *q.shape[1:])
+    k_pad = k.new_zeros(batch_size, max_seqlen_k, *k.shape[1:])
+    v_pad = v.new_zeros(batch_size, max_seqlen_k, *v.shape[1:])
+    q_pad[seq_q, pos_q] = q
+    k_pad[seq_k, pos_k] = k
+    v_pad[seq_k, pos_k] = v
+    
+    # Boolean mask, True = attend: key padding, plus causal if requested
+    key_pos = torch.arange(max_seqlen_k, device=device)
+    attn_mask = (key_pos[None, :] < lens_k[:, None])[:, None, None, :]  # (batch, 1, 1, seqlen_k)
+    if causal:
+        query_pos = torch.arange(max_seqlen_q, device=device)
+        attn_mask = attn_mask & (key_pos[None, :] <= query_pos[:, None])  # (batch, 1, seqlen_q, seqlen_k)
+    
+    out = _sdpa_attention(q_pad, k_pad, v_pad, attn_mask, dropout_p, softmax_scale, causal=False)
+    
+    # Unpad back to packed (total_q, num_heads, head_dim)
+    return out[seq_q, pos_q]
+
+
+def _flash_attn_varlen_loop(
+    q: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    cu_seqlens_q: torch.Tensor,
+    cu_seqlens_k: torch.Tensor,
+    dropout_p: float,
+    softmax_scale: Optional[float],
+    causal: bool
+) -> torch.Tensor:
+    """Per-sequence varlen fallback, used when padding would waste too much work."""
     batch_size = cu_seqlens_q.shape[0] - 1
-    head_dim = q.shape[-1]
-    num_heads = q.shape[1] if q.dim() == 3 else q.shape[2]
+    
+    # One device-to-host copy per offsets tensor instead of an .item() sync per boundary
+    cu_q = cu_seqlens_q.tolist()
+    cu_k = cu_seqlens_k.tolist()
     
     outputs = []
     
     for i in range(batch_size):
-        start_q = cu_seqlens_q[i].item()
-        end_q = cu_seqlens_q[i + 1].item()
-        start_k = cu_seqlens_k[i].item()
-        end_k = cu_seqlens_k[i + 1].item()
+        start_q, end_q = cu_q[i], cu_q[i + 1]
+        start_k, end_k = cu_k[i], cu_k[i + 1]
         
-        q_i = q[start_q:end_q].unsqueeze(0)  # (1, seqlen_q, num_heads, head_dim) or adjust
+        q_i = q[start_q:end_q].unsqueeze(0)  # (1, seqlen_q, num_heads, head_dim)
         k_i = k[start_k:end_k].unsqueeze(0)
         v_i = v[start_k:end_k].unsqueeze(0)
         
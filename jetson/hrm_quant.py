@@ -0,0 +1,101 @@
+"""
+Weight quantization for HRM inference on Jetson.
+
+HRM's CastedLinear / CastedEmbedding cast their FP32 weights to the forward
+dtype (bfloat16 by default) on every call, so inference reads 4-byte weights
+and writes a 2-byte copy per layer per step. On the memory-bandwidth-bound
+Orin this is the bulk of the weight traffic.
+
+    bf16  store the parameters in bfloat16 (identical results when the
+          model's forward_dtype is bfloat16 - the cast was happening anyway)
+    int8  weight-only int8 with per-output-channel scales for the linear
+          layers; the dequantize is fused into the matmul by torch.compile.
+          Uses torchao's int8_weight_only kernels when torchao is installed
+
+Float buffers (e.g. the rotary cos/sin tables) are left in FP32.
+"""
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+# torchao ships tuned int8 weight-only kernels; Int8WeightOnlyLinear otherwise
+try:
+    from torchao.quantization import int8_weight_only, quantize_
+    HAS_TORCHAO = True
+except ImportError:
+    HAS_TORCHAO = False
+
+QUANT_MODES = ('none', 'bf16', 'int8')
+
+
+class Int8WeightOnlyLinear(nn.Module):
+    """Drop-in for CastedLinear holding int8 weights and per-row scales."""
+
+    def __init__(self, linear: nn.Module):
+        super().__init__()
+        weight = linear.weight.detach().float()
+        scale = weight.abs().amax(dim=1, keepdim=True).clamp(min=1e-8) / 127
+
+        self.register_buffer('weight', torch.round(weight / scale).clamp(-127, 127).to(torch.int8))
+        self.register_buffer('scale', scale.squeeze(1).to(torch.bfloat16))
+        self.register_buffer(
+            'bias', linear.bias.detach().to(torch.bfloat16) if linear.bias is not None else None
+        )
+
+    def forward(self, input: torch.Tensor) -> torch.Tensor:
+        out = F.linear(input, self.weight.to(input.dtype)) * self.scale.to(input.dtype)
+        if self.bias is not None:
+            out = out + self.bias.to(input.dtype)
+        return out
+
+
+def _cast_parameters(model: nn.Module, dtype: torch.dtype):
+    for param in model.parameters():
+        if param.is_floating_point():
+            param.data = param.data.to(dtype)
+
+
+def _bf16_linear(linear: nn.Module) -> nn.Linear:
+    """Plain bf16 nn.Linear with a CastedLinear's weights (what torchao quantizes)"""
+    out_features, in_features = linear.weight.shape
+    new = nn.Linear(in_features, out_features, bias=linear.bias is not None,
+                    device=linear.weight.device, dtype=torch.bfloat16)
+    with torch.no_grad():
+        new.weight.copy_(linear.weight)
+        if linear.bias is not None:
+            new.bias.copy_(linear.bias)
+    return new
+
+
+def _replace_linears(module: nn.Module, linear_cls: type, make_linear=Int8WeightOnlyLinear):
+    for name, child in module.named_children():
+        if isinstance(child, linear_cls):
+            setattr(module, name, make_linear(child))
+        else:
+            _replace_linears(child, linear_cls, make_linear)
+
+
+def quantize_model(model: nn.Module, mode: str) -> nn.Module:
+    """Quantize a loaded HRM model in place (call after load_state_dict)."""
+    if mode not in QUANT_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode} (expected one of {QUANT_MODES})")
+    if mode == 'none':
+        return model
+
+    if mode == 'int8':
+        from models.layers import CastedLinear
+        
+        # torchao's nn.Linear kernels don't cast, so only with a bf16 forward
+        forward_dtype = getattr(getattr(model, 'config', None), 'forward_dtype', 'bfloat16')
+        if HAS_TORCHAO and forward_dtype == 'bfloat16':
+            _replace_linears(model, CastedLinear, _bf16_linear)
+            _cast_parameters(model, torch.bfloat16)
+            quantize_(model, int8_weight_only())
+            return model
+        
+        _replace_linears(model, CastedLinear)
+
+    # Remaining float parameters (embeddings, and all weights in bf16 mode)
+    _cast_parameters(model, torch.bfloat16)
+    return model
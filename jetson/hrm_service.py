@@ -22,18 +22,79 @@ IMPORTANT: HRM is NOT a pip-installable package. You must:
 """
 
 import asyncio
+import functools
 import json
 import logging
 import os
 import signal
+import subprocess
 import sys
+import threading
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple, List, Dict, Any
 
+import numpy as np
 import websockets
 from websockets.client import WebSocketClientProtocol
 
+# PyTorch is only needed for HRM inference; without it the service runs BFS-only.
+# The CUDA allocator reads its config once, so set it before torch loads: cap
+# cached block splitting so the large blocks don't fragment the Jetson's shared memory.
+os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF', 'max_split_size_mb:128')
+try:
+    import torch
+    HAS_TORCH = True
+except ImportError:
+    HAS_TORCH = False
+
+# Numba-compiled BFS (bfs.py); SciPy or pure Python when Numba is missing
+from bfs import HAS_NUMBA, bfs_solve_flat, extract_path_flat, warmup as warmup_bfs
+
+# SciPy's csgraph BFS runs the fallback search in C; pure Python otherwise
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import breadth_first_order
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+# orjson encodes straight to bytes in C (the bridge decodes frames with
+# data.toString(), so binary frames are fine); stdlib json otherwise.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError.
+try:
+    import orjson
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+    HAS_ORJSON = True
+except ImportError:
+    json_dumps = json.dumps
+    json_loads = json.loads
+    HAS_ORJSON = False
+
+# safetensors checkpoints are memory-mapped, so restarts load from the page cache
+try:
+    from safetensors.torch import load_file as load_safetensors, save_file as save_safetensors
+    HAS_SAFETENSORS = True
+except ImportError:
+    HAS_SAFETENSORS = False
+
+# msgpack frames (~3x smaller than JSON for grid/path payloads), used only
+# when the backend accepts the 'msgpack' subprotocol
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+# uvloop (libuv) cuts per-message event loop overhead; default asyncio loop otherwise
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
 # ============================================
 # Configuration
 # ============================================
@@ -42,8 +103,24 @@ DEFAULT_SERVER = os.environ.get('RENDER_WS_URL', 'wss://iu-rw9m.onrender.com')
 JETSON_SECRET = os.environ.get('JETSON_SECRET', 'dev-secret-change-in-prod')
 HRM_MODEL_ID = os.environ.get('HRM_MODEL_ID', 'sapientinc/HRM-checkpoint-maze-30x30-hard')
 HRM_REPO_PATH = os.environ.get('HRM_REPO_PATH', './HRM')  # Path to cloned HRM repo
+HRM_REPO_URL = 'https://github.com/sapientinc/HRM.git'
+HRM_COMPILE = os.environ.get('HRM_COMPILE', '1') == '1'  # torch.compile the model on CUDA
+HRM_QUANT = os.environ.get('HRM_QUANT', 'none')  # Weight quantization: none, bf16, int8
+HRM_REFRESH_CHECKPOINT = os.environ.get('HRM_REFRESH_CHECKPOINT', '0') == '1'  # Check the hub even if cached
+INDUCTOR_CACHE_DIR = os.path.expanduser('~/.cache/hrm/inductor')  # Unless TORCHINDUCTOR_CACHE_DIR is set
+WIRE_FORMAT = os.environ.get('HRM_WIRE_FORMAT', 'json')  # 'msgpack' to offer msgpack framing
 RECONNECT_DELAY = 5  # seconds
 PING_INTERVAL = 25   # seconds
+MODEL_SEQ_LEN = 900  # HRM maze checkpoints are trained on 30x30 grids
+FLAT_CHECKPOINT_FILE = 'model.flat'  # Converted checkpoint when safetensors is missing
+# Only fetch weights + config from the hub (HRM checkpoints name the weights file 'checkpoint')
+CHECKPOINT_PATTERNS = ['checkpoint*', '*.pt', '*.bin', '*.safetensors', 'all_config.yaml']
+DOWNLOAD_WORKERS = 8
+
+# Solve request dynamic batching
+MAX_BATCH = 8        # Max grids per HRM forward pass
+MAX_WAIT_MS = 15     # How long to wait for more requests before running a partial batch
+MAX_QUEUE = 32       # Pending solves beyond this are rejected as busy
 
 # ============================================
 # Logging Setup
@@ -76,20 +153,194 @@ def ensure_hrm_in_path():
 
 
 def download_checkpoint(model_id: str) -> str:
-    """Download model checkpoint from HuggingFace"""
+    """
+    Download model checkpoint from HuggingFace. A snapshot that is already
+    in the cache is used without contacting the hub (restarts don't wait on
+    the network, and work offline); set HRM_REFRESH_CHECKPOINT=1 to check
+    for a newer revision. Converted weights live inside the per-revision
+    snapshot directory, so a new revision never reuses stale ones.
+    """
     from huggingface_hub import snapshot_download
+    from huggingface_hub.utils import LocalEntryNotFoundError
     
-    logger.info(f"Downloading checkpoint from HuggingFace: {model_id}")
-    
-    local_path = snapshot_download(
+    download_kwargs = dict(
         repo_id=model_id,
-        cache_dir=os.path.expanduser('~/.cache/hrm')
+        cache_dir=os.path.expanduser('~/.cache/hrm'),
+        allow_patterns=CHECKPOINT_PATTERNS,
     )
     
+    if not HRM_REFRESH_CHECKPOINT:
+        try:
+            local_path = snapshot_download(**download_kwargs, local_files_only=True)
+            logger.info(f"Using cached checkpoint: {local_path}")
+            return local_path
+        except LocalEntryNotFoundError:
+            pass
+    
+    logger.info(f"Downloading checkpoint from HuggingFace: {model_id}")
+    
+    local_path = snapshot_download(**download_kwargs, max_workers=DOWNLOAD_WORKERS)
+    
     logger.info(f"Checkpoint downloaded to: {local_path}")
     return local_path
 
 
+@functools.lru_cache(maxsize=8)
+def neighbor_table(width: int, height: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    In-grid 4-neighbours (up, down, left, right) of every flat cell index,
+    built once per grid shape so the pure-Python searches skip the bounds
+    and row-wrap checks.
+    """
+    size = width * height
+    table = []
+    for idx in range(size):
+        col = idx % width
+        neighbors = []
+        if idx >= width:
+            neighbors.append(idx - width)
+        if idx + width < size:
+            neighbors.append(idx + width)
+        if col > 0:
+            neighbors.append(idx - 1)
+        if col < width - 1:
+            neighbors.append(idx + 1)
+        table.append(tuple(neighbors))
+    return tuple(table)
+
+
+def run_act_steps(model, batch: Dict[str, Any], steps: int):
+    """
+    Run `steps` ACT steps of an HRM model from a fresh carry. With steps =
+    halt_max_steps this is a complete eval solve with no data-dependent
+    control flow, so torch.compile unrolls it into a single graph.
+    """
+    carry = model.initial_carry(batch)
+    for _ in range(steps):
+        carry, outputs = model(carry, batch)
+    return carry, outputs
+
+
+def copy_weights_to_device(state_dict: Dict[str, Any], device) -> Dict[str, Any]:
+    """
+    Copy CPU weights to a CUDA device on a side stream: each tensor is pinned
+    while the previous tensor's host->device copy is still in flight, with a
+    single synchronize at the end. CPU targets are returned unchanged.
+    """
+    if device.type != 'cuda':
+        return state_dict
+    
+    stream = torch.cuda.Stream(device)
+    device_state_dict = {}
+    with torch.cuda.stream(stream):
+        for k, v in state_dict.items():
+            device_state_dict[k] = v.pin_memory().to(device, non_blocking=True)
+    stream.synchronize()
+    return device_state_dict
+
+
+def save_flat_checkpoint(state_dict: Dict[str, Any], flat_file: str):
+    """
+    Write weights as one contiguous blob plus a JSON index of
+    {name: {offset, nbytes, shape, dtype}} (used when safetensors is missing).
+    """
+    index = {}
+    offset = 0
+    with open(flat_file + '.tmp', 'wb') as f:
+        for name, tensor in sorted(state_dict.items()):
+            data = tensor.detach().contiguous().cpu().reshape(-1).view(torch.uint8)
+            data.numpy().tofile(f)
+            index[name] = {
+                'offset': offset,
+                'nbytes': data.numel(),
+                'shape': list(tensor.shape),
+                'dtype': str(tensor.dtype).removeprefix('torch.'),
+            }
+            offset += data.numel()
+    with open(flat_file + '.json.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(flat_file + '.tmp', flat_file)
+    os.replace(flat_file + '.json.tmp', flat_file + '.json')
+
+
+def load_flat_checkpoint(flat_file: str) -> Dict[str, Any]:
+    """Memory-map a blob written by save_flat_checkpoint into CPU tensors (no unpickling)"""
+    with open(flat_file + '.json') as f:
+        index = json.load(f)
+    # Copy-on-write mapping: pages are read lazily and the tensors stay writable
+    blob = np.memmap(flat_file, dtype=np.uint8, mode='c')
+    
+    state_dict = {}
+    for name, entry in index.items():
+        data = torch.from_numpy(blob[entry['offset']:entry['offset'] + entry['nbytes']])
+        state_dict[name] = data.view(getattr(torch, entry['dtype'])).view(entry['shape'])
+    return state_dict
+
+
+def load_checkpoint_weights(checkpoint_file: str, device) -> Dict[str, Any]:
+    """
+    Load checkpoint weights onto device.
+    
+    A torch checkpoint is converted once, next to it, to a loading-friendly
+    format: model.safetensors, or a flat blob + index (model.flat) when
+    safetensors isn't installed. Later loads memory-map that file instead of
+    unpickling the original, and stream the mapped tensors to the device.
+    """
+    if checkpoint_file.endswith('.safetensors'):
+        return copy_weights_to_device(load_safetensors(checkpoint_file, device='cpu'), device)
+    
+    checkpoint_dir = os.path.dirname(checkpoint_file)
+    if HAS_SAFETENSORS:
+        converted_file = os.path.join(checkpoint_dir, 'model.safetensors')
+    else:
+        converted_file = os.path.join(checkpoint_dir, FLAT_CHECKPOINT_FILE)
+    
+    if not os.path.exists(converted_file):
+        state_dict = torch.load(checkpoint_file, map_location='cpu', mmap=True, weights_only=True)
+        try:
+            if HAS_SAFETENSORS:
+                tmp_file = converted_file + '.tmp'
+                save_safetensors({k: v.contiguous() for k, v in state_dict.items()}, tmp_file)
+                os.replace(tmp_file, converted_file)
+            else:
+                save_flat_checkpoint(state_dict, converted_file)
+            logger.info(f"Converted checkpoint for fast loading: {converted_file}")
+        except Exception as e:
+            logger.warning(f"Checkpoint conversion failed, using torch checkpoint: {e}")
+            return copy_weights_to_device(state_dict, device)
+    
+    if HAS_SAFETENSORS:
+        state_dict = load_safetensors(converted_file, device='cpu')
+    else:
+        state_dict = load_flat_checkpoint(converted_file)
+    return copy_weights_to_device(state_dict, device)
+
+
+def skip_random_init():
+    """
+    Context manager that turns the random weight-init ops into no-ops while
+    the model is constructed. Tensors are still allocated on the device, so
+    non-persistent buffers (e.g. rotary tables) are built as usual; only the
+    parameter fills that the checkpoint overwrites anyway are skipped.
+    """
+    from torch.overrides import TorchFunctionMode
+    
+    skipped = {
+        torch.Tensor.uniform_, torch.Tensor.normal_, torch.Tensor.erfinv_,
+        torch.nn.init.uniform_, torch.nn.init.normal_, torch.nn.init.trunc_normal_,
+        torch.nn.init.kaiming_uniform_, torch.nn.init.kaiming_normal_,
+        torch.nn.init.xavier_uniform_, torch.nn.init.xavier_normal_,
+    }
+    
+    class SkipRandomInit(TorchFunctionMode):
+        def __torch_function__(self, func, types, args=(), kwargs=None):
+            if func in skipped:
+                return args[0] if args else kwargs.get('tensor')
+            return func(*args, **(kwargs or {}))
+    
+    return SkipRandomInit()
+
+
 class HRMModel:
     """
     Wrapper for the REAL HRM (Hierarchical Reasoning Model).
@@ -100,20 +351,47 @@ class HRMModel:
     Falls back to BFS if HRM loading fails.
     """
     
-    def __init__(self, model_id: str = HRM_MODEL_ID):
+    def __init__(self, model_id: str = HRM_MODEL_ID, quant: str = HRM_QUANT):
         self.model_id = model_id
+        self.quant = quant
         self.model = None
         self.device = None
         self.loaded = False
         self.use_bfs_fallback = False
         self.checkpoint_path = None
         self.config = None
+        self._buffers = {}  # batch size -> (host tokens, device tokens, inputs, puzzle ids, host predictions)
+        self._run_steps = run_act_steps  # torch.compile'd in _compile_model()
+        self.use_cuda_graphs = False  # Replay eager solves as raw CUDA graphs
+        self._cuda_graphs = {}  # batch size -> (graph, static logits)
+        self._graph_pool = None
+        # Warmup, graph capture and every solve run on this one thread:
+        # cudagraph trees and captured graphs are per thread, so work done
+        # on the load() thread wouldn't be reused by requests
+        self._infer_thread: Optional[int] = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='hrm-infer', initializer=self._bind_infer_thread
+        )
         logger.info(f"HRM Model wrapper initialized for: {model_id}")
         
+    def _bind_infer_thread(self):
+        self._infer_thread = threading.get_ident()
+    
+    def _on_infer_thread(self, fn, *args):
+        """Call fn on the inference thread (directly if already there) and return its result"""
+        if threading.get_ident() == self._infer_thread:
+            return fn(*args)
+        return self.executor.submit(fn, *args).result()
+    
     def load(self) -> bool:
         """Load the HRM model from HuggingFace checkpoint"""
+        if HAS_NUMBA:
+            # Compile the BFS fallback now so the first request doesn't pay for it
+            warmup_bfs()
+        
         try:
-            import torch
+            if not HAS_TORCH:
+                raise ImportError("PyTorch is not installed")
             import yaml
             
             # Determine device
@@ -129,9 +407,15 @@ class HRMModel:
             # Ensure HRM repo is available
             if not ensure_hrm_in_path():
                 logger.warning("HRM repository not available - attempting to clone...")
-                clone_result = os.system(f'git clone https://github.com/sapientinc/HRM.git {HRM_REPO_PATH}')
-                if clone_result != 0:
-                    raise RuntimeError("Failed to clone HRM repository")
+                # Shallow, blobless clone: only the current tree is downloaded
+                try:
+                    subprocess.run(
+                        ['git', 'clone', '--depth=1', '--filter=blob:none', '--single-branch',
+                         HRM_REPO_URL, HRM_REPO_PATH],
+                        check=True, capture_output=True, text=True
+                    )
+                except (OSError, subprocess.CalledProcessError) as e:
+                    raise RuntimeError(f"Failed to clone HRM repository: {(getattr(e, 'stderr', None) or str(e)).strip()}")
                 ensure_hrm_in_path()
             
             # Download checkpoint from HuggingFace
@@ -143,9 +427,12 @@ class HRMModel:
             for f in os.listdir(checkpoint_dir):
                 fpath = os.path.join(checkpoint_dir, f)
                 if os.path.isfile(fpath) and f not in ['.gitattributes', 'all_config.yaml', 'README.md']:
-                    if not f.endswith(('.yaml', '.json', '.md', '.txt')):
+                    if not f.endswith(('.yaml', '.json', '.md', '.txt', '.tmp', '.flat')):
                         checkpoint_files.append(f)
             
+            # Prefer the converted safetensors copy (see load_checkpoint_weights)
+            checkpoint_files.sort(key=lambda f: not f.endswith('.safetensors'))
+            
             if not checkpoint_files:
                 raise RuntimeError(f"No checkpoint file found in {checkpoint_dir}")
             
@@ -188,12 +475,12 @@ class HRMModel:
             
             # Instantiate model
             logger.info(f"Instantiating model: {arch_name}")
-            with torch.device('cuda' if torch.cuda.is_available() else 'cpu'):
+            with torch.device(self.device), skip_random_init():
                 self.model = model_cls(model_config)
             
             # Load checkpoint weights
             logger.info(f"Loading model weights from: {checkpoint_file}")
-            state_dict = torch.load(checkpoint_file, map_location=self.device)
+            state_dict = load_checkpoint_weights(checkpoint_file, self.device)
             
             # Clean state dict - remove loss head and _orig_mod prefixes
             clean_state_dict = {}
@@ -207,7 +494,10 @@ class HRMModel:
             
             # Try to load weights
             try:
-                self.model.load_state_dict(clean_state_dict, strict=False)
+                missing, _ = self.model.load_state_dict(clean_state_dict, strict=False)
+                if missing:
+                    # Random init was skipped, so these hold uninitialized memory
+                    logger.warning(f"Checkpoint is missing {len(missing)} weights: {missing[:5]}")
             except Exception as load_err:
                 logger.warning(f"Partial weight loading: {load_err}")
                 # Try with original state dict
@@ -216,6 +506,24 @@ class HRMModel:
             self.model.to(self.device)
             self.model.eval()
             
+            # Forward runs in forward_dtype (bfloat16); let any remaining FP32
+            # matmuls use TF32 tensor cores too
+            torch.set_float32_matmul_precision('high')
+            
+            if self.quant != 'none':
+                from hrm_quant import quantize_model
+                quantize_model(self.model, self.quant)
+                logger.info(f"Quantized HRM weights: {self.quant}")
+            
+            if HRM_COMPILE and self.device.type == 'cuda':
+                self._on_infer_thread(self._compile_model)
+            
+            if self.device.type == 'cuda' and self._run_steps is run_act_steps:
+                # Not compiled (disabled, or no Triton on this JetPack): still cut
+                # the per-kernel launch overhead by replaying captured solves
+                self.use_cuda_graphs = True
+                self._on_infer_thread(self._capture_cuda_graph, 1)
+            
             self.loaded = True
             self.use_bfs_fallback = False
             
@@ -234,6 +542,136 @@ class HRMModel:
             self.loaded = True
             return True
     
+    def _compile_model(self):
+        """
+        torch.compile the fixed-length ACT solve (CUDA graphs, fixed shapes)
+        and warm it up so compilation happens before the service starts
+        taking requests. Stays in eager mode if compilation fails.
+        """
+        # Inductor caches compiled kernels under /tmp by default, which the
+        # Jetson clears on reboot; keep them next to the checkpoints instead
+        os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', INDUCTOR_CACHE_DIR)
+        
+        try:
+            torch._dynamo.config.cache_size_limit = 16
+            # The whole fixed-length ACT loop is one graph (see run_act_steps)
+            self._run_steps = torch.compile(run_act_steps, mode='reduce-overhead', dynamic=False)
+            
+            logger.info("Compiling HRM model (first run may take a while)...")
+            compile_start = time.perf_counter()
+            dummy = self._get_buffers(1)[2]
+            for _ in range(2):  # 1st run compiles, 2nd records the CUDA graphs
+                self._run_model(dummy)
+            logger.info(f"HRM model compiled in {time.perf_counter() - compile_start:.1f}s")
+        except Exception as e:
+            logger.warning(f"torch.compile failed, using eager model: {e}")
+            self._run_steps = run_act_steps
+    
+    def _capture_cuda_graph(self, batch_size: int):
+        """
+        Capture one fixed-length eager solve over the reusable input buffers
+        for a batch size as a CUDA graph. Returns (graph, static logits), or
+        None (and disables CUDA graphs) if capture fails.
+        """
+        # Same lookup as _run_model: only a fixed step count can be captured
+        steps = getattr(getattr(self.model, 'config', None), 'halt_max_steps', None)
+        if not steps:
+            logger.warning("Model config has no halt_max_steps, not capturing CUDA graphs")
+            self.use_cuda_graphs = False
+            return None
+        
+        _, _, inputs, puzzle_ids, _ = self._get_buffers(batch_size)
+        batch = {"inputs": inputs, "puzzle_identifiers": puzzle_ids}
+        
+        try:
+            if self._graph_pool is None:
+                self._graph_pool = torch.cuda.graph_pool_handle()
+            
+            with torch.inference_mode():
+                # Warm up on a side stream first (lazy init, cuBLAS workspaces)
+                current = torch.cuda.current_stream(self.device)
+                stream = torch.cuda.Stream(self.device)
+                stream.wait_stream(current)
+                with torch.cuda.stream(stream):
+                    run_act_steps(self.model, batch, steps)
+                current.wait_stream(stream)
+                
+                graph = torch.cuda.CUDAGraph()
+                with torch.cuda.graph(graph, pool=self._graph_pool):
+                    _, outputs = run_act_steps(self.model, batch, steps)
+            
+            captured = self._cuda_graphs[batch_size] = (graph, outputs["logits"])
+            logger.info(f"Captured HRM CUDA graph for batch size {batch_size}")
+            return captured
+        except Exception as e:
+            logger.warning(f"CUDA graph capture failed, running eager: {e}")
+            self.use_cuda_graphs = False
+            return None
+    
+    def _get_buffers(self, batch_size: int):
+        """
+        Reusable tensors for a batch size: uint8 token staging on the host
+        (pinned on CUDA) and on the device, the int64 device input tensor,
+        the puzzle ids and (on CUDA) a pinned int8 buffer the predictions are
+        copied back into, so steady-state solves don't allocate on either
+        side. Tokens cross to the GPU as bytes and are widened there.
+        """
+        buffers = self._buffers.get(batch_size)
+        if buffers is None:
+            is_cuda = self.device.type == 'cuda'
+            host_tokens = torch.zeros((batch_size, MODEL_SEQ_LEN), dtype=torch.uint8, pin_memory=is_cuda)
+            device_tokens = torch.zeros_like(host_tokens, device=self.device) if is_cuda else host_tokens
+            inputs = torch.zeros((batch_size, MODEL_SEQ_LEN), dtype=torch.long, device=self.device)
+            # HRM uses puzzle_identifiers for identifying which puzzle this is
+            # For inference, we use 0
+            puzzle_ids = torch.zeros((batch_size,), dtype=torch.long, device=self.device)
+            host_predictions = torch.zeros_like(host_tokens, dtype=torch.int8) if is_cuda else None
+            buffers = self._buffers[batch_size] = (host_tokens, device_tokens, inputs, puzzle_ids, host_predictions)
+        return buffers
+    
+    def _run_model(self, input_tensor):
+        """Run the ACT loop on a (batch, MODEL_SEQ_LEN) token tensor and return the output logits"""
+        batch_size = input_tensor.shape[0]
+        _, _, inputs, puzzle_ids, _ = self._get_buffers(batch_size)
+        batch = {
+            "inputs": input_tensor,
+            "puzzle_identifiers": puzzle_ids,
+        }
+        
+        halt_max_steps = getattr(getattr(self.model, 'config', None), 'halt_max_steps', None)
+        
+        # Captured graphs read the reusable inputs buffer for their batch size
+        if self.use_cuda_graphs and input_tensor is inputs:
+            captured = self._cuda_graphs.get(batch_size) or self._capture_cuda_graph(batch_size)
+            if captured is not None:
+                graph, logits = captured
+                graph.replay()  # Reads the inputs buffer, rewrites the static logits
+                return logits
+        
+        with torch.inference_mode():
+            if halt_max_steps and not self.model.training:
+                # Eval halts every sequence at exactly halt_max_steps: no checks needed
+                _, outputs = self._run_steps(self.model, batch, halt_max_steps)
+                return outputs["logits"]
+            
+            # Initialize carry state
+            carry = self.model.initial_carry(batch)
+            
+            # Every sequence halts by step halt_max_steps, so step in blocks of
+            # that size and only sync with the GPU to check the halted flag
+            # between blocks. Overshooting would reset the halted carry and
+            # restart the puzzle.
+            halt_max_steps = halt_max_steps or 1
+            max_iterations = 100  # Safety limit
+            for step in range(1, max_iterations + 1):
+                carry, outputs = self.model(carry, batch)
+                
+                # Check if all sequences have halted
+                if step % halt_max_steps == 0 and carry.halted.all():
+                    break
+        
+        return outputs["logits"]  # Shape: (batch, seq_len=900, vocab_size)
+    
     def infer(self, grid: List[int], width: int, height: int) -> Tuple[List[Tuple[int, int]], bool]:
         """
         Run HRM inference on the grid
@@ -248,113 +686,128 @@ class HRMModel:
             path: List of (row, col) positions
             success: Whether a valid path was found
         """
-        start_time = time.time()
+        result = self.infer_batch([(grid, width, height)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def infer_batch(self, requests: List[Tuple[List[int], int, int]]) -> List[Any]:
+        """
+        Run inference on several (grid, width, height) requests with one HRM
+        forward pass for the whole batch.
         
-        # Reshape grid to 2D
-        grid_2d = [grid[i*width:(i+1)*width] for i in range(height)]
+        Returns one (path, success) tuple per request, in order, or the
+        exception raised while preparing that request's grid.
+        Runs on the inference thread, whichever thread calls it.
+        """
+        return self._on_infer_thread(self._infer_batch, requests)
+    
+    def _infer_batch(self, requests: List[Tuple[List[int], int, int]]) -> List[Any]:
+        start_time = time.perf_counter()
         
-        # Find start and target positions
-        start = None
-        target = None
-        for r in range(height):
-            for c in range(width):
-                if grid_2d[r][c] == 2:  # START
-                    start = (r, c)
-                elif grid_2d[r][c] == 3:  # TARGET
-                    target = (r, c)
+        results: List[Any] = [([], False)] * len(requests)
+        prepared = []  # (index, grid_np, width, height, start, target)
         
-        if not start or not target:
-            logger.warning("Could not find start or target in grid")
-            return [], False
+        for i, (grid, width, height) in enumerate(requests):
+            try:
+                # Reshape grid to 2D; binary (msgpack bin) grids are read as raw token bytes
+                if isinstance(grid, (bytes, bytearray)):
+                    grid_np = np.frombuffer(grid, dtype=np.int8).reshape(height, width).copy()
+                else:
+                    grid_np = np.asarray(grid, dtype=np.int8).reshape(height, width)
+            except Exception as e:
+                results[i] = e
+                continue
+            
+            # Find start and target positions
+            starts = np.argwhere(grid_np == 2)  # START
+            targets = np.argwhere(grid_np == 3)  # TARGET
+            
+            if len(starts) == 0 or len(targets) == 0:
+                logger.warning("Could not find start or target in grid")
+                continue
+            
+            start = (int(starts[-1][0]), int(starts[-1][1]))
+            target = (int(targets[-1][0]), int(targets[-1][1]))
+            prepared.append((i, grid_np, width, height, start, target))
+        
+        if not prepared:
+            return results
         
         # Use HRM if available, otherwise BFS fallback
         if self.use_bfs_fallback or self.model is None:
-            path = self._bfs_solve(grid_2d, start, target, width, height)
+            paths = [
+                self._bfs_solve(grid_np, start, target, width, height)
+                for _, grid_np, width, height, start, target in prepared
+            ]
             method = "BFS"
         else:
-            path = self._hrm_solve(grid, grid_2d, width, height, start, target)
+            paths = self._hrm_solve([item[1:] for item in prepared])
             method = "HRM"
         
-        elapsed = (time.time() - start_time) * 1000
-        logger.info(f"Inference ({method}) completed in {elapsed:.2f}ms, path length: {len(path)}")
+        for (i, *_), path in zip(prepared, paths):
+            results[i] = (path, len(path) > 0)
         
-        return path, len(path) > 0
-    
-    def _hrm_solve(
-        self,
-        grid: List[int],
-        grid_2d: List[List[int]],
-        width: int,
-        height: int,
-        start: Tuple[int, int],
-        target: Tuple[int, int]
-    ) -> List[Tuple[int, int]]:
-        """Solve using HRM model"""
-        import torch
+        # Per-request results are logged by handle_solve; only build this when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            elapsed = (time.perf_counter() - start_time) * 1000
+            logger.debug(
+                f"Inference ({method}) completed in {elapsed:.2f}ms for {len(prepared)} grid(s), "
+                f"path lengths: {[len(path) for path in paths]}"
+            )
         
+        return results
+    
+    def _hrm_solve(self, items: List[tuple]) -> List[List[Tuple[int, int]]]:
+        """Solve a batch of (grid_np, width, height, start, target) items using HRM"""
         try:
             # The model was trained with seq_len=900 (30x30 grids)
             # We need to pad the input to match this expected size
-            MODEL_SEQ_LEN = 900  # 30x30
-            MODEL_GRID_SIZE = 30
-            
-            actual_seq_len = len(grid)
-            
-            # Pad input to MODEL_SEQ_LEN with zeros (walls)
-            if actual_seq_len < MODEL_SEQ_LEN:
-                padded_grid = grid + [0] * (MODEL_SEQ_LEN - actual_seq_len)
-            else:
-                padded_grid = grid[:MODEL_SEQ_LEN]  # Truncate if larger (shouldn't happen)
+            host_tokens, device_tokens, input_tensor, _, host_predictions = self._get_buffers(len(items))
+            padded_grids = host_tokens.numpy()
+            padded_grids.fill(0)  # Zeros are walls
+            for row, (grid_np, *_) in zip(padded_grids, items):
+                tokens = grid_np.ravel()[:MODEL_SEQ_LEN]  # Truncate if larger (shouldn't happen)
+                row[:len(tokens)] = tokens
             
             # Prepare input tensor in the format HRM expects
-            input_tensor = torch.tensor(padded_grid, dtype=torch.long).unsqueeze(0).to(self.device)
-            
-            # HRM uses puzzle_identifiers for identifying which puzzle this is
-            # For inference, we use 0
-            puzzle_ids = torch.zeros((1,), dtype=torch.long).to(self.device)
+            if device_tokens is not host_tokens:
+                device_tokens.copy_(host_tokens, non_blocking=True)
+            input_tensor.copy_(device_tokens)
             
-            batch = {
-                "inputs": input_tensor,
-                "puzzle_identifiers": puzzle_ids,
-            }
+            logits = self._run_model(input_tensor)
+            # Tokens fit in int8 (the dtype path extraction works on): 8x less to copy back
+            predictions = logits.argmax(dim=-1).to(torch.int8)  # Shape: (batch, 900)
+            if host_predictions is not None:
+                host_predictions.copy_(predictions, non_blocking=True)
+                torch.cuda.current_stream(self.device).synchronize()
+                predictions = host_predictions
+            predictions = predictions.numpy()
             
-            with torch.no_grad():
-                # Initialize carry state
-                carry = self.model.initial_carry(batch)
+            paths = []
+            for (grid_np, width, height, start, target), prediction in zip(items, predictions):
+                # Extract only the relevant portion of predictions (original grid size)
+                # and reshape to grid
+                output_grid = prediction[:width * height].reshape(height, width)
                 
-                # Run forward pass(es) until halted
-                max_iterations = 100  # Safety limit
-                for _ in range(max_iterations):
-                    carry, outputs = self.model(carry, batch)
-                    
-                    # Check if all sequences have halted
-                    if carry.halted.all():
-                        break
+                # Extract path from output - cells marked as path (1) or target (3)
+                path = self._extract_path_from_output(output_grid, start, target, width, height)
                 
-                # Get output logits
-                logits = outputs["logits"]  # Shape: (batch, seq_len=900, vocab_size)
-                predictions = logits.argmax(dim=-1)[0].cpu().numpy()  # Shape: (900,)
-            
-            # Extract only the relevant portion of predictions (original grid size)
-            predictions = predictions[:actual_seq_len]
+                if not path:
+                    logger.warning("HRM output did not produce valid path, falling back to BFS")
+                    path = self._bfs_solve(grid_np, start, target, width, height)
+                paths.append(path)
             
-            # Reshape predictions to grid
-            output_grid = predictions.reshape(height, width)
-            
-            # Extract path from output - cells marked as path (1) or target (3)
-            path = self._extract_path_from_output(output_grid, start, target, width, height)
-            
-            if path:
-                return path
-            else:
-                logger.warning("HRM output did not produce valid path, falling back to BFS")
-                return self._bfs_solve(grid_2d, start, target, width, height)
+            return paths
             
         except Exception as e:
             logger.error(f"HRM inference failed: {e}")
             import traceback
             traceback.print_exc()
-            return self._bfs_solve(grid_2d, start, target, width, height)
+            return [
+                self._bfs_solve(grid_np, start, target, width, height)
+                for grid_np, width, height, start, target in items
+            ]
     
     def _extract_path_from_output(
         self,
@@ -365,65 +818,207 @@ class HRMModel:
         height: int
     ) -> List[Tuple[int, int]]:
         """Extract path from HRM output grid using BFS on marked cells"""
+        if HAS_NUMBA:
+            path = extract_path_flat(
+                np.ascontiguousarray(output_grid, dtype=np.int8).ravel(),
+                start[0] * width + start[1], target[0] * width + target[1], width, height
+            )
+            return [divmod(idx, width) for idx in path.tolist()]
+        
+        # Same walk over flat indices: a cell is a candidate if it is marked
+        # as path/target (or is the target) and not yet visited
+        output = np.asarray(output_grid).ravel().tolist()
+        neighbors = neighbor_table(width, height)
+        start_idx = start[0] * width + start[1]
+        target_idx = target[0] * width + target[1]
+        marked = bytearray(cell == 1 or cell == 3 for cell in output)
+        marked[target_idx] = 1
+        marked[start_idx] = 0
         
-        path = [start]
-        current = start
-        visited = {start}
-        
-        while current != target:
-            r, c = current
-            found = False
-            
-            for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < height and 0 <= nc < width:
-                    if (nr, nc) not in visited:
-                        # Check if this cell is part of the solution path
-                        if output_grid[nr][nc] in [1, 3] or (nr, nc) == target:
-                            path.append((nr, nc))
-                            visited.add((nr, nc))
-                            current = (nr, nc)
-                            found = True
-                            break
-            
-            if not found:
+        path = [start_idx]
+        current = start_idx
+        
+        while current != target_idx:
+            for neighbor in neighbors[current]:
+                if marked[neighbor]:
+                    break
+            else:
                 return []  # Path incomplete
+            
+            marked[neighbor] = 0  # Visited
+            path.append(neighbor)
+            current = neighbor
         
-        return path
+        return [divmod(idx, width) for idx in path]
     
     def _bfs_solve(
         self, 
-        grid: List[List[int]], 
+        grid: np.ndarray, 
         start: Tuple[int, int], 
         target: Tuple[int, int],
         width: int,
         height: int
     ) -> List[Tuple[int, int]]:
         """BFS pathfinding (fallback)"""
+        if HAS_NUMBA:
+            path = bfs_solve_flat(
+                np.ascontiguousarray(grid).ravel(), start[0] * width + start[1], target[0] * width + target[1], width, height
+            )
+            return [divmod(idx, width) for idx in path.tolist()]
+        if HAS_SCIPY:
+            return self._bfs_solve_scipy(grid, start, target, width, height)
+        return self._bfs_solve_python(grid, start, target, width, height)
+    
+    def _bfs_solve_scipy(
+        self,
+        grid: np.ndarray,
+        start: Tuple[int, int],
+        target: Tuple[int, int],
+        width: int,
+        height: int
+    ) -> List[Tuple[int, int]]:
+        """BFS over a CSR adjacency of the open cells, run by scipy.sparse.csgraph"""
+        WALL = 0
+        
+        open_cells = grid != WALL
+        idx = np.arange(width * height).reshape(height, width)
+        
+        # Edges between horizontally and vertically adjacent open cells
+        h_mask = open_cells[:, :-1] & open_cells[:, 1:]
+        v_mask = open_cells[:-1, :] & open_cells[1:, :]
+        src = np.concatenate([idx[:, :-1][h_mask], idx[:-1, :][v_mask]])
+        dst = np.concatenate([idx[:, 1:][h_mask], idx[1:, :][v_mask]])
+        rows = np.concatenate([src, dst])
+        cols = np.concatenate([dst, src])
+        adjacency = csr_matrix(
+            (np.ones(len(rows), dtype=np.int8), (rows, cols)),
+            shape=(width * height, width * height)
+        )
+        
+        start_idx = start[0] * width + start[1]
+        target_idx = target[0] * width + target[1]
+        _, predecessors = breadth_first_order(
+            adjacency, start_idx, directed=True, return_predecessors=True
+        )
+        
+        if target_idx != start_idx and predecessors[target_idx] < 0:
+            return []  # No path found
+        
+        # Walk predecessors back to the start
+        path = []
+        current = target_idx
+        while current != start_idx:
+            path.append(divmod(int(current), width))
+            current = predecessors[current]
+        path.append(start)
+        path.reverse()
+        return path
+    
+    def _bfs_solve_python(
+        self, 
+        grid: np.ndarray, 
+        start: Tuple[int, int], 
+        target: Tuple[int, int],
+        width: int,
+        height: int
+    ) -> List[Tuple[int, int]]:
+        """Pure-Python BFS over flat cell indices (used when SciPy is not installed)"""
         
         WALL = 0
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        neighbors = neighbor_table(width, height)
         
-        queue = deque([(start, [start])])
-        visited = {start}
+        # Walls start out visited so one bytearray test covers both checks
+        visited = bytearray((np.asarray(grid) == WALL).tobytes())
+        parents = [-1] * (width * height)
+        
+        start_idx = start[0] * width + start[1]
+        target_idx = target[0] * width + target[1]
+        visited[start_idx] = 1
+        
+        queue = deque([start_idx])
         
         while queue:
-            (row, col), path = queue.popleft()
+            idx = queue.popleft()
             
-            if (row, col) == target:
+            if idx == target_idx:
+                # Walk parent pointers back to the start
+                path = []
+                while idx != -1:
+                    path.append(divmod(idx, width))
+                    idx = parents[idx]
+                path.reverse()
                 return path
             
-            for dr, dc in directions:
-                new_row, new_col = row + dr, col + dc
-                
-                if 0 <= new_row < height and 0 <= new_col < width:
-                    if (new_row, new_col) not in visited:
-                        if grid[new_row][new_col] != WALL:
-                            visited.add((new_row, new_col))
-                            queue.append(((new_row, new_col), path + [(new_row, new_col)]))
+            for neighbor in neighbors[idx]:
+                if not visited[neighbor]:
+                    visited[neighbor] = 1
+                    parents[neighbor] = idx
+                    queue.append(neighbor)
         
         return []  # No path found
 
+# ============================================
+# Dynamic Batching
+# ============================================
+
+class DynamicBatcher:
+    """
+    Collects concurrent solve requests into batches for HRMModel.infer_batch.
+    
+    Waits up to MAX_WAIT_MS after the first request for up to MAX_BATCH
+    requests, then runs inference on the model's own inference thread so
+    the event loop keeps receiving frames while the model runs: the GPU is
+    one resource, and CUDA graphs / compiled code stay on the thread that
+    warmed them up in load().
+    """
+    
+    def __init__(self, model: HRMModel):
+        self.model = model
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUE)
+        self.task: Optional[asyncio.Task] = None
+        self.executor = model.executor
+    
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+    
+    async def submit(self, grid: List[int], width: int, height: int) -> Tuple[List[Tuple[int, int]], bool]:
+        """Queue one grid and wait for its (path, success). Raises asyncio.QueueFull when busy."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(((grid, width, height), future))
+        return await future
+    
+    async def _next_batch(self) -> List[tuple]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + MAX_WAIT_MS / 1000
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            requests = [request for request, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.model.infer_batch, requests)
+            except Exception as e:
+                results = [e] * len(batch)
+            
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
 # ============================================
 # WebSocket Client
 # ============================================
@@ -431,11 +1026,14 @@ class HRMModel:
 class HRMService:
     """WebSocket client that connects to Render backend"""
     
-    def __init__(self, server_url: str, model_id: str = HRM_MODEL_ID):
+    def __init__(self, server_url: str, model_id: str = HRM_MODEL_ID, quant: str = HRM_QUANT):
         self.server_url = server_url
-        self.model = HRMModel(model_id=model_id)
+        self.model = HRMModel(model_id=model_id, quant=quant)
         self.ws: Optional[WebSocketClientProtocol] = None
         self.running = True
+        self.use_msgpack = False
+        self.batcher: Optional[DynamicBatcher] = None
+        self.tasks = set()
         
     async def connect(self) -> bool:
         """Connect to the Render backend"""
@@ -444,13 +1042,18 @@ class HRMService:
                 'X-Jetson-Auth': JETSON_SECRET
             }
             
+            # Offer msgpack first; a backend that doesn't select it keeps JSON
+            subprotocols = ['msgpack', 'json'] if WIRE_FORMAT == 'msgpack' and HAS_MSGPACK else None
+            
             self.ws = await websockets.connect(
                 self.server_url + '/jetson',
                 additional_headers=extra_headers,
-                ping_interval=PING_INTERVAL
+                ping_interval=PING_INTERVAL,
+                subprotocols=subprotocols
             )
+            self.use_msgpack = self.ws.subprotocol == 'msgpack'
             
-            logger.info(f"Connected to {self.server_url}")
+            logger.info(f"Connected to {self.server_url} ({'msgpack' if self.use_msgpack else 'json'} frames)")
             
             # Send initial status
             await self.send_status()
@@ -461,32 +1064,55 @@ class HRMService:
             logger.error(f"Connection failed: {e}")
             return False
     
+    async def send(self, payload: dict):
+        """Encode and send one message in the negotiated wire format"""
+        if self.use_msgpack:
+            await self.ws.send(msgpack.packb(payload, use_bin_type=True))
+        else:
+            await self.ws.send(json_dumps(payload))
+    
+    def encode_path(self, path: List[Tuple[int, int]]):
+        """
+        Path for a solution message. In msgpack mode it travels as one bin
+        field of little-endian uint16 (row, col) pairs, 4 bytes per step and no
+        per-coordinate encoding; JSON keeps the list of [row, col] pairs.
+        """
+        if self.use_msgpack:
+            return np.asarray(path, dtype='<u2').reshape(-1, 2).tobytes()
+        return path
+    
+    def decode(self, message) -> dict:
+        """Decode one incoming frame (binary frames are msgpack once negotiated)"""
+        if self.use_msgpack and isinstance(message, bytes):
+            return msgpack.unpackb(message, raw=False)
+        return json_loads(message)
+    
     async def send_status(self):
         """Send status update to server"""
         if self.ws:
-            await self.ws.send(json.dumps({
+            await self.send({
                 'type': 'status',
                 'modelLoaded': self.model.loaded,
                 'usingHRM': not self.model.use_bfs_fallback,
                 'device': str(self.model.device) if self.model.device else 'unknown',
                 'timestamp': int(time.time() * 1000)
-            }))
+            })
     
     async def handle_message(self, message: str):
         """Handle incoming message from server"""
         data = {}
         try:
-            data = json.loads(message)
+            data = self.decode(message)
             msg_type = data.get('type')
             
             if msg_type == 'solve':
                 await self.handle_solve(data)
             elif msg_type == 'ping':
-                await self.ws.send(json.dumps({'type': 'pong'}))
+                await self.send({'type': 'pong'})
             else:
                 logger.warning(f"Unknown message type: {msg_type}")
                 
-        except json.JSONDecodeError as e:
+        except ValueError as e:  # json.JSONDecodeError and msgpack decode errors
             logger.error(f"Failed to parse message: {e}")
         except Exception as e:
             logger.error(f"Error handling message: {e}")
@@ -500,26 +1126,30 @@ class HRMService:
         width = data.get('width', 0)
         height = data.get('height', 0)
         
-        logger.info(f"Solve request: {request_id} ({width}x{height} = {len(grid)} tokens)")
-        
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            path, success = self.model.infer(grid, width, height)
-            inference_time = int((time.time() - start_time) * 1000)
+            path, success = await self.batcher.submit(grid, width, height)
+            inference_time = int((time.perf_counter() - start_time) * 1000)
             
             response = {
                 'type': 'solution',
                 'requestId': request_id,
-                'path': path,
+                'path': self.encode_path(path),
                 'success': success,
                 'inferenceTimeMs': inference_time,
                 'method': 'BFS' if self.model.use_bfs_fallback else 'HRM'
             }
             
-            await self.ws.send(json.dumps(response))
-            logger.info(f"Sent solution: success={success}, path={len(path)} steps, method={response['method']}")
+            await self.send(response)
+            logger.info(
+                f"Solved {request_id} ({width}x{height}) in {inference_time}ms: "
+                f"success={success}, path={len(path)} steps, method={response['method']}"
+            )
             
+        except asyncio.QueueFull:
+            logger.warning(f"Solve queue full, rejecting {request_id}")
+            await self.send_error(request_id, 'busy: too many pending solve requests (429)')
         except Exception as e:
             logger.error(f"Inference failed: {e}")
             await self.send_error(request_id, str(e))
@@ -527,11 +1157,11 @@ class HRMService:
     async def send_error(self, request_id: str, message: str):
         """Send error response"""
         if self.ws:
-            await self.ws.send(json.dumps({
+            await self.send({
                 'type': 'error',
                 'requestId': request_id,
                 'message': message
-            }))
+            })
     
     async def run(self):
         """Main run loop with auto-reconnect"""
@@ -540,12 +1170,18 @@ class HRMService:
             logger.error("Failed to load HRM model, exiting")
             return
         
+        self.batcher = DynamicBatcher(self.model)
+        self.batcher.start()
+        
         while self.running:
             try:
                 if await self.connect():
-                    # Message loop
+                    # Message loop - each message gets its own task so concurrent
+                    # solves can be batched together
                     async for message in self.ws:
-                        await self.handle_message(message)
+                        task = asyncio.create_task(self.handle_message(message))
+                        self.tasks.add(task)
+                        task.add_done_callback(self.tasks.discard)
                         
             except websockets.ConnectionClosed as e:
                 logger.warning(f"Connection closed: {e}")
@@ -575,6 +1211,8 @@ def main():
     parser.add_argument('--hrm-path', default=HRM_REPO_PATH, help='Path to HRM repository')
     parser.add_argument('--test', action='store_true', help='Run connection test only')
     parser.add_argument('--bfs-only', action='store_true', help='Force BFS mode (no HRM)')
+    parser.add_argument('--quant', default=HRM_QUANT, choices=['none', 'bf16', 'int8'],
+                        help='HRM weight quantization')
     args = parser.parse_args()
     
     # Use args values (don't need to modify globals)
@@ -594,8 +1232,9 @@ def main():
     logger.info(f"Server: {args.server}")
     logger.info(f"Model: {args.model}")
     logger.info(f"HRM Repo: {args.hrm_path}")
+    logger.info(f"Quantization: {args.quant}")
     
-    service = HRMService(args.server, model_id=hrm_model_id)
+    service = HRMService(args.server, model_id=hrm_model_id, quant=args.quant)
     
     if args.bfs_only:
         service.model.use_bfs_fallback = True
@@ -610,6 +1249,10 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
+    if HAS_UVLOOP:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+    
     if args.test:
         # Test mode - just try to connect once
         async def test_connection():
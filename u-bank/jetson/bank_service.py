@@ -12,20 +12,42 @@ Connects to the same Render WebSocket relay as hrm_service.py.
 """
 
 import asyncio
+import functools
 import json
 import logging
 import os
 import signal
 import sys
 import time
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, Union
 
 import websockets
 from websockets.client import WebSocketClientProtocol
 
-from slm_service import SLMService, Intent
+from slm_service import SLMService
 from graph_compiler import GraphCompiler, AppGraph, load_graph_from_json, visualize_grid
-from planner import Planner, ExecutionPlan
+from planner import Planner, ExecutionPlan, Intent
+
+# orjson encodes straight to UTF-8 bytes in C (the relay decodes frames with
+# data.toString(), so binary frames are fine); stdlib json otherwise.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError.
+try:
+    import orjson
+    # Coerce non-str dict keys the way json.dumps does
+    json_dumps = functools.partial(orjson.dumps, option=orjson.OPT_NON_STR_KEYS)
+    json_loads = orjson.loads
+    HAS_ORJSON = True
+except ImportError:
+    json_dumps = functools.partial(json.dumps, ensure_ascii=False)
+    json_loads = json.loads
+    HAS_ORJSON = False
+
+# uvloop (libuv) cuts per-message event loop overhead; default asyncio loop otherwise
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
 
 # ============================================
 # Configuration
@@ -35,6 +57,13 @@ DEFAULT_SERVER = os.environ.get('RENDER_WS_URL', 'wss://iu-rw9m.onrender.com')
 JETSON_SECRET = os.environ.get('JETSON_SECRET', 'dev-secret-change-in-prod')
 RECONNECT_DELAY = 5
 PING_INTERVAL = 25
+# Maze corridor routing: 'l' (L-shaped paths) or 'dijkstra' (needs SciPy)
+GRAPH_ROUTING = os.environ.get('GRAPH_ROUTING', 'l')
+# Frames at least this large (graph_update) are decoded in a worker thread
+OFFLOAD_PARSE_BYTES = 64 * 1024
+# Handled as soon as they are decoded; every other type touches app/plan
+# state and runs in arrival order
+UNORDERED_MESSAGE_TYPES = frozenset({'ping', 'solve'})
 
 # ============================================
 # Logging
@@ -77,17 +106,39 @@ class HRMInterface:
             self.loaded = False
             return False
 
-    def solve(self, grid: List[int], width: int, height: int):
-        """Solve a maze grid"""
+    def solve(self, grid: Union[List[int], bytes], width: int, height: int):
+        """Solve a maze grid (token list, or one byte per token)"""
         if self.model and self.loaded:
             return self.model.infer(grid, width, height)
         return [], False
 
+    def solve_batch(self, requests: List[Tuple[Union[List[int], bytes], int, int]]) -> List[Tuple[list, bool]]:
+        """Solve several (grid, width, height) mazes in one HRM forward pass"""
+        if not (self.model and self.loaded):
+            return [([], False)] * len(requests)
+        results = self.model.infer_batch(requests)
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.warning(f"HRM could not take maze {i} of the batch: {result}")
+                results[i] = ([], False)  # Planner falls back to graph BFS
+        return results
+
 
 # ============================================
 # Bank Service
 # ============================================
 
+def _intern(value: Any, default: Any = '') -> Any:
+    """
+    Intern a payload string. JSON null (or a missing key) becomes default;
+    other non-string values pass through unchanged, as sys.intern only
+    takes str.
+    """
+    if value is None:
+        value = default
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class BankService:
     """
     Main service orchestrating SLM + GraphCompiler + HRM + Planner.
@@ -107,7 +158,7 @@ class BankService:
 
         # Core modules
         self.slm = SLMService()
-        self.compiler = GraphCompiler()
+        self.compiler = GraphCompiler(routing=GRAPH_ROUTING)
         self.hrm = HRMInterface()
 
         # State
@@ -116,6 +167,21 @@ class BankService:
         self.active_plans: Dict[str, ExecutionPlan] = {}  # requestId → plan
         self.android_connected = False
 
+        # In-flight message tasks, and the turn the next ordered message waits on
+        self._tasks = set()
+        self._order_tail: Optional[asyncio.Future] = None
+
+        # Message type → handler, built once rather than per frame
+        self._handlers = {
+            'voice_command': self._handle_voice_command,
+            'graph_update': self._handle_graph_update,
+            'ui_state': self._handle_ui_state,
+            'action_result': self._handle_action_result,
+            'explore_complete': self._handle_explore_complete,
+            'ping': self._handle_ping,
+            'solve': self._handle_solve,  # Legacy HRM maze solving
+        }
+
     async def start(self):
         """Initialize all modules and start the service"""
         logger.info("=" * 60)
@@ -144,8 +210,10 @@ class BankService:
         while self.running:
             try:
                 if await self._connect():
+                    # Each frame gets its own task, so a slow graph_update
+                    # doesn't hold up pings and legacy solves
                     async for message in self.ws:
-                        await self._handle_message(message)
+                        self._spawn_handler(message)
             except websockets.ConnectionClosed as e:
                 logger.warning(f"Connection closed: {e}")
             except Exception as e:
@@ -182,29 +250,56 @@ class BankService:
     async def _send(self, message: Dict):
         """Send a message to the server"""
         if self.ws:
-            await self.ws.send(json.dumps(message, ensure_ascii=False))
+            await self.ws.send(json_dumps(message))
 
     # ============================================
     # Message Routing
     # ============================================
 
-    async def _handle_message(self, raw: str):
-        """Route incoming messages to handlers"""
+    def _spawn_handler(self, raw: str):
+        """Handle a frame in its own task, taking the next turn in arrival order"""
+        prev_turn = self._order_tail
+        turn = asyncio.get_running_loop().create_future()
+        self._order_tail = turn
+
+        task = asyncio.create_task(self._handle_message(raw, prev_turn, turn))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _pass_turn(prev_turn: Optional[asyncio.Future], turn: Optional[asyncio.Future]):
+        """Complete turn once every earlier message has had its turn"""
+        if turn is None or turn.done():
+            return
+        if prev_turn is None or prev_turn.done():
+            turn.set_result(None)
+        else:
+            prev_turn.add_done_callback(lambda _: BankService._pass_turn(None, turn))
+
+    async def _handle_message(
+        self,
+        raw: str,
+        prev_turn: Optional[asyncio.Future] = None,
+        turn: Optional[asyncio.Future] = None
+    ):
+        """
+        Route incoming messages to handlers.
+        Ordered messages wait for prev_turn before running and complete turn
+        afterwards; unordered ones run right away.
+        """
         try:
-            msg = json.loads(raw)
+            if len(raw) >= OFFLOAD_PARSE_BYTES:
+                msg = await asyncio.to_thread(json_loads, raw)
+            else:
+                msg = json_loads(raw)
             msg_type = msg.get('type', '')
 
-            handlers = {
-                'voice_command': self._handle_voice_command,
-                'graph_update': self._handle_graph_update,
-                'ui_state': self._handle_ui_state,
-                'action_result': self._handle_action_result,
-                'explore_complete': self._handle_explore_complete,
-                'ping': self._handle_ping,
-                'solve': self._handle_solve,  # Legacy HRM maze solving
-            }
+            if msg_type in UNORDERED_MESSAGE_TYPES:
+                self._pass_turn(prev_turn, turn)
+            elif prev_turn is not None:
+                await prev_turn
 
-            handler = handlers.get(msg_type)
+            handler = self._handlers.get(msg_type)
             if handler:
                 await handler(msg)
             else:
@@ -213,9 +308,9 @@ class BankService:
         except json.JSONDecodeError:
             logger.error(f"Invalid JSON: {raw[:100]}")
         except Exception as e:
-            logger.error(f"Error handling message: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error handling message: {e}")
+        finally:
+            self._pass_turn(prev_turn, turn)
 
     # ============================================
     # Voice Command → Intent → Plan
@@ -228,8 +323,9 @@ class BankService:
         """
         payload = msg.get('payload', {})
         text = payload.get('text', '')
-        app_package = payload.get('app', 'com.bancolombia.app')
-        request_id = msg.get('requestId', f"vc-{int(time.time()*1000)}")
+        # Interned: these become long-lived keys of the state dicts
+        app_package = _intern(payload.get('app'), 'com.bancolombia.app')
+        request_id = _intern(msg.get('requestId'), f"vc-{int(time.time()*1000)}")
 
         logger.info(f"Voice command: \"{text}\"")
 
@@ -281,7 +377,7 @@ class BankService:
         plan = planner.plan(
             intent=intent,
             current_screen=current,
-            hrm_solve_fn=self.hrm.solve if self.hrm.loaded else None
+            hrm_solve_batch_fn=self.hrm.solve_batch if self.hrm.loaded else None
         )
 
         # Store active plan
@@ -315,14 +411,18 @@ class BankService:
     async def _handle_graph_update(self, msg: Dict):
         """Handle graph update from Android's AccessibilityService explorer"""
         payload = msg.get('payload', {})
-        app_package = payload.get('app', '')
+        app_package = _intern(payload.get('app'))
         graph_json = payload.get('graph', {})
 
         if not app_package or not graph_json:
             logger.warning("Invalid graph_update: missing app or graph")
             return
 
-        graph = load_graph_from_json(graph_json)
+        # Building the graph and its indexes is CPU work; keep the loop free
+        graph = await asyncio.to_thread(load_graph_from_json, graph_json)
+        old_graph = self.app_graphs.get(app_package)
+        if old_graph is not None:
+            self.compiler.invalidate(old_graph)
         self.app_graphs[app_package] = graph
 
         node_count = len(graph.nodes)
@@ -342,12 +442,15 @@ class BankService:
     async def _handle_ui_state(self, msg: Dict):
         """Handle UI state update from Android"""
         payload = msg.get('payload', {})
-        app_package = payload.get('currentApp', '')
-        screen_id = payload.get('screenFingerprint', '')
+        # Sent on every screen change; interning keeps one copy of each id
+        app_package = _intern(payload.get('currentApp'))
+        screen_id = _intern(payload.get('screenFingerprint'))
 
         if app_package and screen_id:
             self.current_screen[app_package] = screen_id
-            logger.debug(f"UI state: {app_package} → {screen_id}")
+            # Sent on every screen change; only build the line when debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"UI state: {app_package} → {screen_id}")
 
     async def _handle_explore_complete(self, msg: Dict):
         """Handle completion of graph exploration"""
@@ -375,7 +478,7 @@ class BankService:
         request_id = msg.get('requestId', '')
         step_index = payload.get('stepIndex', -1)
         success = payload.get('success', False)
-        new_screen = payload.get('newScreenFingerprint', '')
+        new_screen = _intern(payload.get('newScreenFingerprint'))
         error = payload.get('error', '')
 
         plan = self.active_plans.get(request_id)
@@ -399,7 +502,7 @@ class BankService:
                     'requestId': request_id,
                     'payload': {'summary': plan.summary, 'success': True}
                 })
-                del self.active_plans[request_id]
+                self.active_plans.pop(request_id, None)
         else:
             logger.warning(f"Step {step_index} failed: {error}")
 
@@ -517,6 +620,10 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
+    if HAS_UVLOOP:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+
     asyncio.run(service.start())
 
 
@@ -16,13 +16,38 @@ Token vocabulary (matching HRM training):
   5 = ERROR     (HRM output — inference error)
 """
 
+import sys
 import json
 import math
 import logging
-from typing import Dict, List, Tuple, Optional, Any
-from collections import deque
+import functools
+from typing import Dict, List, Tuple, Optional, Any, Union
+from collections import deque, OrderedDict
 from dataclasses import dataclass, field
 
+import numpy as np
+
+# Numba compiles the edge tracer; the same function runs as plain Python otherwise
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in so the module still imports without Numba."""
+        def wrap(fn):
+            return fn
+        return wrap
+
+# SciPy's Dijkstra carves corridors for routing='dijkstra'
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
 logger = logging.getLogger('GraphCompiler')
 
 # ============================================
@@ -41,6 +66,156 @@ TARGET = 3
 NODE_SPACING = 4
 # Border padding
 BORDER = 1
+# Compiled mazes kept per GraphCompiler (LRU)
+COMPILE_CACHE_SIZE = 64
+
+# How edges become corridors: 'l' = L-shaped paths, 'dijkstra' = cheapest routes
+ROUTING_MODES = ('l', 'dijkstra')
+
+# Dijkstra cost of stepping onto a cell. Open cells are nearly free so later
+# edges reuse corridors; other screens' cells are avoided so routes don't
+# pass through (and ambiguously connect) unrelated nodes
+CORRIDOR_OPEN_COST = 0.01
+CORRIDOR_WALL_COST = 1.0
+CORRIDOR_BLOCKED_COST = float(GRID_TOKENS)
+
+# ============================================
+# Maze Rendering Kernels
+# ============================================
+
+@njit("void(uint8[:, ::1], int64, int64, int64, int64)", cache=True)
+def _trace_l_path_nb(grid, r1, c1, r2, c2):
+    """
+    Mark the L-shaped path (r1,c1) -> (r1,c2) -> (r2,c2) walkable in place:
+    horizontal first, then vertical, turning only WALL cells into PATH.
+    """
+    c_step = 1 if c2 >= c1 else -1
+    for c in range(c1, c2 + c_step, c_step):
+        if grid[r1, c] == WALL:
+            grid[r1, c] = PATH
+
+    r_step = 1 if r2 >= r1 else -1
+    for r in range(r1, r2 + r_step, r_step):
+        if grid[r, c2] == WALL:
+            grid[r, c2] = PATH
+
+
+def _trace_l_path_np(grid, r1, c1, r2, c2):
+    """Same as _trace_l_path_nb, as one masked slice write per segment."""
+    c_lo, c_hi = sorted((c1, c2))
+    row = grid[r1, c_lo:c_hi + 1]
+    row[row == WALL] = PATH
+
+    r_lo, r_hi = sorted((r1, r2))
+    col = grid[r_lo:r_hi + 1, c2]
+    col[col == WALL] = PATH
+
+
+def _trace_l_paths_np(grid, segments):
+    """Trace every (r1, c1, r2, c2) row of segments, in order."""
+    for r1, c1, r2, c2 in segments.tolist():
+        _trace_l_path_np(grid, r1, c1, r2, c2)
+
+
+def _mark_nodes_np(grid, positions):
+    cells = positions.astype(np.intp)
+    grid[cells[:, 0], cells[:, 1]] = PATH
+
+
+@njit("void(uint8[:, ::1], int16[:, ::1], int32[:, ::1], int64, int64)", cache=True)
+def _compile_maze_nb(grid, positions, edges, start, target):
+    """
+    Render the whole maze in one call: clear to WALL, open every node cell,
+    trace the L-path of each (from, to) row of edges (indices into
+    positions), then mark START and TARGET (skipped when negative).
+    """
+    grid[:, :] = WALL
+    for i in range(positions.shape[0]):
+        grid[positions[i, 0], positions[i, 1]] = PATH
+
+    for k in range(edges.shape[0]):
+        a = edges[k, 0]
+        b = edges[k, 1]
+        _trace_l_path_nb(grid, positions[a, 0], positions[a, 1], positions[b, 0], positions[b, 1])
+
+    if start >= 0:
+        grid[positions[start, 0], positions[start, 1]] = START
+    if target >= 0:
+        grid[positions[target, 0], positions[target, 1]] = TARGET
+
+
+def _compile_maze_np(grid, positions, edges, start, target):
+    grid.fill(WALL)
+    _mark_nodes_np(grid, positions)
+    segments = np.concatenate((positions[edges[:, 0]], positions[edges[:, 1]]), axis=1)
+    _trace_l_paths_np(grid, segments)
+    if start >= 0:
+        grid[positions[start, 0], positions[start, 1]] = START
+    if target >= 0:
+        grid[positions[target, 0], positions[target, 1]] = TARGET
+
+
+# Without Numba the slice writes beat running the loop kernel as Python
+compile_maze = _compile_maze_nb if HAS_NUMBA else _compile_maze_np
+
+
+# ============================================
+# Corridor Routing
+# ============================================
+
+@functools.lru_cache(maxsize=1)
+def _lattice_structure() -> Tuple[np.ndarray, np.ndarray]:
+    """CSR indptr / indices of the 4-connected GRID_SIZE x GRID_SIZE lattice"""
+    idx = np.arange(GRID_TOKENS).reshape(GRID_SIZE, GRID_SIZE)
+    a = np.concatenate([idx[:, :-1].ravel(), idx[:-1, :].ravel()])
+    b = np.concatenate([idx[:, 1:].ravel(), idx[1:, :].ravel()])
+    rows = np.concatenate([a, b])
+    cols = np.concatenate([b, a])
+
+    order = np.lexsort((cols, rows))
+    indices = cols[order].astype(np.int32)
+    indptr = np.searchsorted(rows[order], np.arange(GRID_TOKENS + 1)).astype(np.int32)
+    return indptr, indices
+
+
+def carve_corridors(grid: np.ndarray, segments: np.ndarray, blocked: np.ndarray):
+    """
+    Mark the cheapest 4-connected route for each (r1, c1, r2, c2) row of
+    segments walkable in place, in order. Cells already open are nearly free,
+    so later routes share corridors. blocked is a flat bool mask of cells to
+    route around (other nodes); a segment's own endpoints are always allowed.
+    """
+    indptr, indices = _lattice_structure()
+    flat = grid.reshape(-1)
+    cost = np.where(flat == WALL, CORRIDOR_WALL_COST, CORRIDOR_OPEN_COST)
+    cost[blocked] = CORRIDOR_BLOCKED_COST
+
+    for r1, c1, r2, c2 in segments.tolist():
+        source = r1 * GRID_SIZE + c1
+        target = r2 * GRID_SIZE + c2
+        if source == target:
+            continue
+
+        # Edge weight = cost of the cell it enters
+        target_cost = cost[target]
+        cost[target] = CORRIDOR_OPEN_COST
+        lattice = csr_matrix((cost[indices], indices, indptr), shape=(GRID_TOKENS, GRID_TOKENS))
+        _, predecessors = dijkstra(lattice, indices=source, return_predecessors=True)
+        cost[target] = target_cost
+
+        route = []
+        idx = target
+        while idx != source and idx >= 0:
+            route.append(idx)
+            idx = predecessors[idx]
+        if idx != source:
+            continue  # Unreachable (not possible on the full lattice)
+
+        route = np.array(route)
+        carved = route[flat[route] == WALL]
+        flat[carved] = PATH
+        cost[carved[~blocked[carved]]] = CORRIDOR_OPEN_COST
+
 
 # ============================================
 # Data Classes
@@ -75,31 +250,110 @@ class AppGraph:
     nodes: Dict[str, GraphNode] = field(default_factory=dict)
     edges: List[GraphEdge] = field(default_factory=list)
     version: str = "1.0.0"
+    # Adjacency and edge lookups, built by build_index() from nodes/edges
+    _adj: Optional[Dict[str, List[str]]] = field(default=None, init=False, repr=False, compare=False)
+    _radj: Dict[str, List[str]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _edge_index: Dict[Tuple[str, str], GraphEdge] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # Directed (from, to) pairs to trace, edges first then node.edges, deduped
+    all_edges: List[Tuple[str, str]] = field(default_factory=list, init=False, repr=False, compare=False)
+    # Bumped by build_index() so compiled mazes of an older state are not reused
+    _revision: int = field(default=0, init=False, repr=False, compare=False)
+    # Integer encoding: node id → row of GraphCompiler.positions, and all_edges
+    # between known nodes as (E, 2) int32 index pairs
+    node_index: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    edge_array: np.ndarray = field(
+        default_factory=lambda: np.zeros((0, 2), dtype=np.int32), init=False, repr=False, compare=False
+    )
+    # start node → BFS order, memoized by GraphCompiler._bfs_order
+    _bfs_orders: Dict[str, List[str]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # (start, target) → shortest node path, memoized by Planner._bfs_graph_path
+    _paths: Dict[Tuple[str, str], List[str]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # source → {target: first step}, built lazily by the planner (None = not built)
+    _next_hop: Optional[Dict[str, Dict[str, str]]] = field(default=None, init=False, repr=False, compare=False)
+    # Node-to-node adjacency in node_index order as CSR (indptr, indices), then
+    # its transpose, then the node ids; built by the planner
+    _csr: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[str]]] = field(default=None, init=False, repr=False, compare=False)
+
+    def build_index(self):
+        """
+        Precompute neighbour lists and the edge lookup table.
+        Called by load_graph_from_json; call again after mutating nodes/edges.
+        """
+        adj: Dict[str, List[str]] = {}
+        edge_index: Dict[Tuple[str, str], GraphEdge] = {}
+        all_edges: List[Tuple[str, str]] = []
+        traced = set()
 
-    def get_neighbors(self, node_id: str) -> List[str]:
-        """Get all nodes reachable from a given node"""
-        neighbors = []
         for edge in self.edges:
-            if edge.from_node == node_id:
-                neighbors.append(edge.to_node)
-            elif edge.bidirectional and edge.to_node == node_id:
-                neighbors.append(edge.from_node)
-        # Also check node's own edge list
-        node = self.nodes.get(node_id)
-        if node:
+            key = (edge.from_node, edge.to_node)
+            if key not in traced:
+                traced.add(key)
+                all_edges.append(key)
+                # Tracing A -> B already connects B -> A
+                if edge.bidirectional:
+                    traced.add((edge.to_node, edge.from_node))
+
+            adj.setdefault(edge.from_node, []).append(edge.to_node)
+            edge_index.setdefault((edge.from_node, edge.to_node), edge)
+            if edge.bidirectional:
+                if edge.to_node != edge.from_node:
+                    adj.setdefault(edge.to_node, []).append(edge.from_node)
+                edge_index.setdefault((edge.to_node, edge.from_node), edge)
+
+        # Merge each node's own edge list, skipping neighbours already listed
+        for node_id, node in self.nodes.items():
+            neighbors = adj.setdefault(node_id, [])
+            seen = set(neighbors)
             for e in node.edges:
-                if e not in neighbors:
+                if e not in seen:
+                    seen.add(e)
                     neighbors.append(e)
-        return neighbors
+                if (node_id, e) not in traced:
+                    traced.add((node_id, e))
+                    all_edges.append((node_id, e))
+
+        # Reverse adjacency, for searches that walk back from a target
+        radj: Dict[str, List[str]] = {}
+        for node_id, neighbors in adj.items():
+            for neighbor in neighbors:
+                radj.setdefault(neighbor, []).append(node_id)
+
+        node_index = {node_id: i for i, node_id in enumerate(self.nodes)}
+        edge_pairs = [
+            (node_index[a], node_index[b])
+            for a, b in all_edges
+            if a in node_index and b in node_index
+        ]
+
+        self._adj = adj
+        self._radj = radj
+        self._edge_index = edge_index
+        self.all_edges = all_edges
+        self.node_index = node_index
+        self.edge_array = np.array(edge_pairs, dtype=np.int32).reshape(-1, 2)
+        self._bfs_orders = {}
+        self._paths = {}
+        self._next_hop = None
+        self._csr = None
+        self._revision += 1
+
+    def get_neighbors(self, node_id: str) -> List[str]:
+        """Get all nodes reachable from a given node"""
+        if self._adj is None:
+            self.build_index()
+        return list(self._adj.get(node_id, ()))
+
+    def get_predecessors(self, node_id: str) -> List[str]:
+        """Get all nodes that can reach a given node in one step"""
+        if self._adj is None:
+            self.build_index()
+        return list(self._radj.get(node_id, ()))
 
     def get_edge(self, from_id: str, to_id: str) -> Optional[GraphEdge]:
         """Get the edge between two nodes"""
-        for edge in self.edges:
-            if edge.from_node == from_id and edge.to_node == to_id:
-                return edge
-            if edge.bidirectional and edge.to_node == from_id and edge.from_node == to_id:
-                return edge
-        return None
+        if self._adj is None:
+            self.build_index()
+        return self._edge_index.get((from_id, to_id))
 
 
 # ============================================
@@ -117,10 +371,30 @@ class GraphCompiler:
     4. Flatten to 900 tokens for HRM input
     """
 
-    def __init__(self):
-        self.grid = [[WALL] * GRID_SIZE for _ in range(GRID_SIZE)]
+    def __init__(self, routing: str = 'l'):
+        if routing not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode: {routing} (expected one of {ROUTING_MODES})")
+        if routing == 'dijkstra' and not HAS_SCIPY:
+            logger.warning("SciPy not installed — falling back to L-shaped routing")
+            routing = 'l'
+        self.routing = routing
+
+        # One contiguous uint8 buffer (tokens fit in a byte), reused across compiles
+        self.grid = np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.uint8)
         self.node_positions: Dict[str, Tuple[int, int]] = {}
         self.position_to_node: Dict[Tuple[int, int], str] = {}
+        # (row, col) per node, indexed by AppGraph.node_index
+        self.positions = np.zeros((0, 2), dtype=np.int16)
+        # (id(graph), revision, start, target) → (graph, result, grid, node_positions, position_to_node)
+        self._cache: OrderedDict = OrderedDict()
+
+    def invalidate(self, graph: Optional[AppGraph] = None):
+        """Drop cached mazes for one graph, or all of them"""
+        if graph is None:
+            self._cache.clear()
+            return
+        for key in [k for k, entry in self._cache.items() if entry[0] is graph]:
+            del self._cache[key]
 
     def compile(
         self,
@@ -134,6 +408,7 @@ class GraphCompiler:
         Returns:
             {
                 "grid": List[int],          # Flattened 900 tokens
+                "grid_bytes": bytes,        # Same tokens, one byte each
                 "grid_2d": List[List[int]],  # 30x30 2D grid
                 "width": 30,
                 "height": 30,
@@ -142,34 +417,99 @@ class GraphCompiler:
                 "start_pos": (row, col),
                 "target_pos": (row, col)
             }
+
+        Results are cached per (graph, start, target) and shared between
+        calls, so treat them as read-only.
+        """
+        result = self.compile_many(graph, [(start_node, target_node)])[0]
+        if isinstance(result, ValueError):
+            raise result
+        return result
+
+    def compile_many(
+        self,
+        graph: AppGraph,
+        pairs: List[Tuple[str, str]]
+    ) -> List[Union[Dict[str, Any], ValueError]]:
         """
-        # Reset grid
-        self.grid = [[WALL] * GRID_SIZE for _ in range(GRID_SIZE)]
-        self.node_positions = {}
-        self.position_to_node = {}
+        Compile one maze per (start, target) pair of the same graph.
 
-        # Step 1: Layout nodes in the grid
-        self._layout_nodes(graph)
+        Layout and edge tracing don't depend on the endpoints, so they run
+        once for the whole batch; each uncached pair then only copies the
+        traced grid and marks its START and TARGET.
 
-        # Step 2: Trace paths between connected nodes
-        self._trace_edges(graph)
+        Returns:
+            One entry per pair, in order: the compile() result, or the
+            ValueError for a pair naming a node that isn't in the graph
+        """
+        if graph._adj is None:
+            graph.build_index()
+
+        results: List[Union[Dict[str, Any], ValueError]] = []
+        base = None  # Traced grid without START / TARGET, rendered on the first miss
+
+        for start_node, target_node in pairs:
+            key = (id(graph), graph._revision, start_node, target_node)
+            entry = self._cache.get(key)
+            # The graph reference guards against id() reuse after garbage collection
+            if entry is not None and entry[0] is graph:
+                self._cache.move_to_end(key)
+                _, result, grid, positions, node_positions, position_to_node = entry
+                np.copyto(self.grid, grid)
+                self.positions = positions.copy()
+                self.node_positions = dict(node_positions)
+                self.position_to_node = dict(position_to_node)
+                results.append(result)
+                continue
+
+            if base is None:
+                # Reset layout
+                self.node_positions = {}
+                self.position_to_node = {}
+                self.positions = np.zeros((len(graph.nodes), 2), dtype=np.int16)
+
+                # Step 1: Layout nodes in the grid
+                self._layout_nodes(graph)
+
+                # Steps 2-3: Open node cells and trace paths between connected
+                # nodes (one compiled call for L-paths)
+                if self.routing == 'dijkstra':
+                    self._carve_maze(graph, -1, -1)
+                else:
+                    compile_maze(self.grid, self.positions, graph.edge_array, -1, -1)
+                base = (self.grid.copy(), self.positions, self.node_positions, self.position_to_node)
+            else:
+                # A cache hit in between restored another layout
+                np.copyto(self.grid, base[0])
+                _, self.positions, self.node_positions, self.position_to_node = base
+
+            if start_node not in self.node_positions:
+                results.append(ValueError(f"Start node '{start_node}' not found in graph"))
+                continue
+            if target_node not in self.node_positions:
+                results.append(ValueError(f"Target node '{target_node}' not found in graph"))
+                continue
 
-        # Step 3: Mark START and TARGET
-        if start_node not in self.node_positions:
-            raise ValueError(f"Start node '{start_node}' not found in graph")
-        if target_node not in self.node_positions:
-            raise ValueError(f"Target node '{target_node}' not found in graph")
+            start_pos = self.node_positions[start_node]
+            target_pos = self.node_positions[target_node]
+            self.grid[start_pos] = START
+            self.grid[target_pos] = TARGET
 
-        start_r, start_c = self.node_positions[start_node]
-        target_r, target_c = self.node_positions[target_node]
+            result = self._maze_result(start_pos, target_pos)
+            self._cache[key] = (
+                graph, result, self.grid.copy(), self.positions.copy(),
+                dict(self.node_positions), dict(self.position_to_node)
+            )
+            if len(self._cache) > COMPILE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+            results.append(result)
 
-        self.grid[start_r][start_c] = START
-        self.grid[target_r][target_c] = TARGET
+        return results
 
+    def _maze_result(self, start_pos: Tuple[int, int], target_pos: Tuple[int, int]) -> Dict[str, Any]:
+        """Package the current grid and layout as a compile() result"""
         # Step 4: Flatten
-        flat_grid = []
-        for row in self.grid:
-            flat_grid.extend(row)
+        flat_grid = self.grid.ravel().tolist()
 
         # Build position-to-node mapping for output
         pos_to_node_str = {}
@@ -178,13 +518,14 @@ class GraphCompiler:
 
         return {
             "grid": flat_grid,
-            "grid_2d": [row[:] for row in self.grid],
+            "grid_bytes": self.grid.tobytes(),
+            "grid_2d": self.grid.tolist(),
             "width": GRID_SIZE,
             "height": GRID_SIZE,
             "node_positions": dict(self.node_positions),
             "position_to_node": pos_to_node_str,
-            "start_pos": (start_r, start_c),
-            "target_pos": (target_r, target_c)
+            "start_pos": start_pos,
+            "target_pos": target_pos
         }
 
     def _layout_nodes(self, graph: AppGraph):
@@ -221,7 +562,8 @@ class GraphCompiler:
             if nid not in ordered:
                 ordered.append(nid)
 
-        # Place nodes
+        # Place nodes (per-node debug lines are only built when debugging)
+        debug = logger.isEnabledFor(logging.DEBUG)
         for idx, node_id in enumerate(ordered):
             row_idx = idx // cols
             col_idx = idx % cols
@@ -242,94 +584,60 @@ class GraphCompiler:
                 if r >= GRID_SIZE - BORDER:
                     break
 
+            self.positions[graph.node_index[node_id]] = (r, c)
             self.node_positions[node_id] = (r, c)
             self.position_to_node[(r, c)] = node_id
-            self.grid[r][c] = PATH  # Mark node position as walkable
 
-            logger.debug(f"Node '{node_id}' placed at ({r}, {c})")
+            if debug:
+                logger.debug(f"Node '{node_id}' placed at ({r}, {c})")
 
     def _bfs_order(self, graph: AppGraph, start: str) -> List[str]:
-        """BFS traversal order for layout"""
-        visited = []
-        queue = deque([start])
-        seen = {start}
+        """BFS traversal order for layout (memoized on the graph)"""
+        if graph._adj is None:
+            graph.build_index()
 
-        while queue:
-            node = queue.popleft()
-            visited.append(node)
+        order = graph._bfs_orders.get(start)
+        if order is None:
+            adj = graph._adj
+            nodes = graph.nodes
+            order = []
+            queue = deque([start])
+            seen = {start}
 
-            for neighbor in graph.get_neighbors(node):
-                if neighbor not in seen and neighbor in graph.nodes:
-                    seen.add(neighbor)
-                    queue.append(neighbor)
+            while queue:
+                node = queue.popleft()
+                order.append(node)
 
-        return visited
+                for neighbor in adj.get(node, ()):
+                    if neighbor not in seen and neighbor in nodes:
+                        seen.add(neighbor)
+                        queue.append(neighbor)
 
-    def _trace_edges(self, graph: AppGraph):
-        """
-        Trace walkable paths between connected nodes in the grid.
-        Uses L-shaped paths (horizontal then vertical) to avoid diagonal issues.
-        """
-        traced = set()
+            graph._bfs_orders[start] = order
 
-        for edge in graph.edges:
-            key = (edge.from_node, edge.to_node)
-            if key in traced:
-                continue
-            traced.add(key)
-
-            if edge.from_node not in self.node_positions or edge.to_node not in self.node_positions:
-                continue
-
-            r1, c1 = self.node_positions[edge.from_node]
-            r2, c2 = self.node_positions[edge.to_node]
-
-            self._trace_l_path(r1, c1, r2, c2)
-
-            if edge.bidirectional:
-                traced.add((edge.to_node, edge.from_node))
-
-        # Also trace edges from node.edges lists
-        for node_id, node in graph.nodes.items():
-            for neighbor_id in node.edges:
-                key = (node_id, neighbor_id)
-                if key in traced:
-                    continue
-                traced.add(key)
+        return list(order)
 
-                if node_id not in self.node_positions or neighbor_id not in self.node_positions:
-                    continue
+    def _carve_maze(self, graph: AppGraph, start_i: int, target_i: int):
+        """
+        Render the maze with Dijkstra corridors (routing='dijkstra'): the
+        cheapest routes between connected nodes, steering around other nodes.
+        """
+        self.grid.fill(WALL)
+        _mark_nodes_np(self.grid, self.positions)  # Node positions are walkable
 
-                r1, c1 = self.node_positions[node_id]
-                r2, c2 = self.node_positions[neighbor_id]
+        # (E, 4) rows of r1, c1, r2, c2, gathered straight from the position array
+        edges = graph.edge_array
+        segments = np.concatenate((self.positions[edges[:, 0]], self.positions[edges[:, 1]]), axis=1)
 
-                self._trace_l_path(r1, c1, r2, c2)
+        cells = self.positions.astype(np.intp)
+        blocked = np.zeros(GRID_TOKENS, dtype=bool)
+        blocked[cells[:, 0] * GRID_SIZE + cells[:, 1]] = True
+        carve_corridors(self.grid, segments, blocked)
 
-    def _trace_l_path(self, r1: int, c1: int, r2: int, c2: int):
-        """
-        Trace an L-shaped path from (r1,c1) to (r2,c2).
-        Goes horizontal first, then vertical.
-        Only marks cells that are currently WALL as PATH.
-        """
-        # Horizontal segment
-        c_step = 1 if c2 >= c1 else -1
-        c = c1
-        while c != c2:
-            if self.grid[r1][c] == WALL:
-                self.grid[r1][c] = PATH
-            c += c_step
-        if self.grid[r1][c2] == WALL:
-            self.grid[r1][c2] = PATH
-
-        # Vertical segment
-        r_step = 1 if r2 >= r1 else -1
-        r = r1
-        while r != r2:
-            if self.grid[r][c2] == WALL:
-                self.grid[r][c2] = PATH
-            r += r_step
-        if self.grid[r2][c2] == WALL:
-            self.grid[r2][c2] = PATH
+        if start_i >= 0:
+            self.grid[tuple(self.positions[start_i])] = START
+        if target_i >= 0:
+            self.grid[tuple(self.positions[target_i])] = TARGET
 
     def decode_hrm_path(
         self,
@@ -366,6 +674,11 @@ class GraphCompiler:
 # Graph Loading
 # ============================================
 
+def _intern_id(value):
+    """Intern string IDs; other JSON values (e.g. numeric IDs) pass through"""
+    return sys.intern(value) if type(value) is str else value
+
+
 def load_graph_from_json(json_data: Dict) -> AppGraph:
     """Load an AppGraph from JSON (as sent by Android)"""
     graph = AppGraph(
@@ -373,13 +686,16 @@ def load_graph_from_json(json_data: Dict) -> AppGraph:
         version=json_data.get("version", "1.0.0")
     )
 
-    # Load nodes
+    # Load nodes (IDs interned: they key every index and memo, so interning
+    # saves memory and makes hashing and equality checks cheaper; lookups
+    # still go through dicts and ==, never identity)
     nodes_data = json_data.get("nodes", {})
     for node_id, node_data in nodes_data.items():
+        node_id = _intern_id(node_id)
         node = GraphNode(
             id=node_id,
             label=node_data.get("label", node_id),
-            edges=node_data.get("edges", []),
+            edges=[_intern_id(n) for n in node_data.get("edges", [])],
             activity=node_data.get("activity", ""),
             accessibility_snapshot=node_data.get("accessibility_snapshot", {}),
             dynamic=node_data.get("dynamic", False)
@@ -390,35 +706,58 @@ def load_graph_from_json(json_data: Dict) -> AppGraph:
     edges_data = json_data.get("edges", [])
     for edge_data in edges_data:
         edge = GraphEdge(
-            from_node=edge_data["from"],
-            to_node=edge_data["to"],
+            from_node=_intern_id(edge_data["from"]),
+            to_node=_intern_id(edge_data["to"]),
             action=edge_data.get("action", {}),
             weight=edge_data.get("weight", 1),
             bidirectional=edge_data.get("bidirectional", False)
         )
         graph.edges.append(edge)
 
+    graph.build_index()
     return graph
 
 
+_GRID_CHARS = {0: '█', 1: '·', 2: 'S', 3: 'T', 4: '★', 5: '✗'}
+
+# Token → display character, applied to a row decoded byte-for-char
+_GRID_SYMBOLS = str.maketrans(
+    {chr(i): '?' for i in range(256)}
+    | {chr(token): char for token, char in _GRID_CHARS.items()}
+)
+
+
+def _render_grid_row(row) -> str:
+    """Display characters for one row; unknown tokens render as '?'"""
+    try:
+        cells = np.asarray(row)
+    except (ValueError, TypeError):
+        cells = None
+    if cells is not None and cells.ndim == 1 and cells.dtype.kind in 'biu':
+        # Out-of-range tokens go to 255, which isn't a token either
+        codes = np.where((cells >= 0) & (cells < 256), cells, 255).astype(np.uint8)
+        return codes.tobytes().decode('latin-1').translate(_GRID_SYMBOLS)
+    return "".join(_GRID_CHARS.get(cell, '?') for cell in row)
+
+
 def visualize_grid(grid_2d: List[List[int]], node_positions: Dict[str, Tuple[int, int]] = None) -> str:
     """Pretty-print a grid for debugging"""
-    symbols = {0: '█', 1: '·', 2: 'S', 3: 'T', 4: '★', 5: '✗'}
-    lines = []
-
-    # Build position-to-label map
-    pos_labels = {}
+    # Build position-to-label map, grouped by row
+    row_labels: Dict[int, Dict[int, str]] = {}
     if node_positions:
         for node_id, (r, c) in node_positions.items():
-            pos_labels[(r, c)] = node_id[0].upper()  # First letter
+            row_labels.setdefault(r, {})[c] = node_id[0].upper()  # First letter
 
+    lines = []
     for r, row in enumerate(grid_2d):
-        line = ""
-        for c, cell in enumerate(row):
-            if (r, c) in pos_labels and cell == PATH:
-                line += pos_labels[(r, c)]
-            else:
-                line += symbols.get(cell, '?')
+        line = _render_grid_row(row)
+        labels = row_labels.get(r)
+        if labels:
+            chars = list(line)
+            for c, label in labels.items():
+                if 0 <= c < len(chars) and row[c] == PATH:
+                    chars[c] = label
+            line = "".join(chars)
         lines.append(line)
 
     return "\n".join(lines)
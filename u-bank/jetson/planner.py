@@ -13,11 +13,27 @@ The planner is the bridge between "what the user wants" (SLM)
 and "how to get there" (HRM + graph).
 """
 
+import sys
 import json
 import logging
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 
+import numpy as np
+
+# Numba compiles the BFS used on large graphs; bidirectional Python BFS otherwise
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in so the module still imports without Numba."""
+        def wrap(fn):
+            return fn
+        return wrap
+
 from graph_compiler import (
     AppGraph, GraphCompiler, GraphEdge,
     load_graph_from_json, visualize_grid
@@ -29,7 +45,10 @@ logger = logging.getLogger('Planner')
 # Data Classes
 # ============================================
 
-@dataclass
+# __slots__ instead of a per-instance __dict__ (dataclass slots need 3.10+)
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class Intent:
     """Parsed user intent from SLM"""
     name: str                          # e.g. "send_money"
@@ -38,7 +57,7 @@ class Intent:
     raw_text: str = ""
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ActionStep:
     """A single executable action on the Android device"""
     index: int
@@ -50,7 +69,7 @@ class ActionStep:
     timeout_ms: int = 5000
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ExecutionPlan:
     """Complete plan to execute a user intent"""
     intent: Intent
@@ -61,6 +80,99 @@ class ExecutionPlan:
     estimated_time_ms: int = 0
 
 
+# Graphs up to this many nodes get an all-pairs next-hop table on first use;
+# larger ones search each checkpoint pair on demand
+NEXT_HOP_MAX_NODES = 256
+
+# ============================================
+# Graph Search Kernel
+# ============================================
+
+@njit("int32[:](int32[::1], int32[::1], int32[::1], int32[::1], int64, int64)", cache=True, nogil=True)
+def bidirectional_bfs_csr(indptr, indices, rindptr, rindices, source, target):
+    """
+    Bidirectional BFS over CSR adjacency (forward) and its transpose
+    (backward), expanding the smaller frontier one full level at a time.
+
+    Returns:
+        int32 node indices from source to target (empty if unreachable)
+    """
+    n = indptr.shape[0] - 1
+    if source == target:
+        return np.full(1, source, dtype=np.int32)
+
+    # Parent pointers (-1 = not reached); each queue holds one side's visit order
+    fwd = np.full(n, -1, dtype=np.int32)
+    bwd = np.full(n, -1, dtype=np.int32)
+    fwd_queue = np.empty(n, dtype=np.int32)
+    bwd_queue = np.empty(n, dtype=np.int32)
+    fwd[source] = source
+    bwd[target] = target
+    fwd_queue[0] = source
+    bwd_queue[0] = target
+    fwd_head, fwd_tail = 0, 1
+    bwd_head, bwd_tail = 0, 1
+    meeting = -1
+
+    while meeting < 0 and fwd_head < fwd_tail and bwd_head < bwd_tail:
+        if fwd_tail - fwd_head <= bwd_tail - bwd_head:
+            level_end = fwd_tail
+            while meeting < 0 and fwd_head < level_end:
+                current = fwd_queue[fwd_head]
+                fwd_head += 1
+                for k in range(indptr[current], indptr[current + 1]):
+                    neighbor = indices[k]
+                    if fwd[neighbor] >= 0:
+                        continue
+                    fwd[neighbor] = current
+                    if bwd[neighbor] >= 0:
+                        meeting = neighbor
+                        break
+                    fwd_queue[fwd_tail] = neighbor
+                    fwd_tail += 1
+        else:
+            level_end = bwd_tail
+            while meeting < 0 and bwd_head < level_end:
+                current = bwd_queue[bwd_head]
+                bwd_head += 1
+                for k in range(rindptr[current], rindptr[current + 1]):
+                    neighbor = rindices[k]
+                    if bwd[neighbor] >= 0:
+                        continue
+                    bwd[neighbor] = current
+                    if fwd[neighbor] >= 0:
+                        meeting = neighbor
+                        break
+                    bwd_queue[bwd_tail] = neighbor
+                    bwd_tail += 1
+
+    if meeting < 0:
+        return np.empty(0, dtype=np.int32)
+
+    # Stitch source → meeting (walking fwd back) and meeting → target
+    head_len = 1
+    idx = meeting
+    while idx != source:
+        idx = fwd[idx]
+        head_len += 1
+    length = head_len
+    idx = meeting
+    while idx != target:
+        idx = bwd[idx]
+        length += 1
+
+    path = np.empty(length, dtype=np.int32)
+    idx = meeting
+    for i in range(head_len - 1, -1, -1):
+        path[i] = idx
+        idx = fwd[idx]
+    idx = meeting
+    for i in range(head_len, length):
+        idx = bwd[idx]
+        path[i] = idx
+    return path
+
+
 # ============================================
 # Intent → Checkpoint Mapping
 # ============================================
@@ -68,17 +180,18 @@ class ExecutionPlan:
 # Pre-defined checkpoint sequences for common banking intents.
 # These are the "sub-goals" that HRM will navigate between.
 # The planner uses the graph to find the actual path between each pair.
+# Node IDs in graphs are interned on load, like these literals.
 
 INTENT_CHECKPOINTS = {
-    "send_money": [
+    "send_money": (
         "home",
         "transfers",
         "send_contact",
         "enter_amount",
         "confirm_send",
         "success"
-    ],
-    "send_money_from_pocket": [
+    ),
+    "send_money_from_pocket": (
         "home",
         "pockets",
         "pocket_detail",
@@ -89,26 +202,44 @@ INTENT_CHECKPOINTS = {
         "enter_amount",
         "confirm_send",
         "success"
-    ],
-    "check_balance": [
-        "home"
+    ),
+    "check_balance": (
+        "home",
         # Balance is visible on home screen
-    ],
-    "transfer_pocket": [
+    ),
+    "transfer_pocket": (
         "home",
         "pockets",
         "pocket_detail",
         "withdraw_pocket"
-    ],
-    "pay_bill": [
+    ),
+    "pay_bill": (
         "home",
         "payments",
         "pay_bill"
-    ],
-    "transaction_history": [
-        "home"
+    ),
+    "transaction_history": (
+        "home",
         # History is accessible from home
-    ]
+    )
+}
+
+
+def _dedupe_checkpoints(checkpoints) -> Tuple[str, ...]:
+    """Remove duplicates while preserving order (home may be revisited)"""
+    seen = set()
+    deduped = []
+    for cp in checkpoints:
+        if cp not in seen or cp == "home":  # Allow revisiting home
+            seen.add(cp)
+            deduped.append(cp)
+    return tuple(deduped)
+
+
+# Deduplicated once at import; _resolve_checkpoints only prepends the current screen
+RESOLVED_CHECKPOINTS: Dict[str, Tuple[str, ...]] = {
+    intent_key: _dedupe_checkpoints(checkpoints)
+    for intent_key, checkpoints in INTENT_CHECKPOINTS.items()
 }
 
 
@@ -132,7 +263,8 @@ class Planner:
         self,
         intent: Intent,
         current_screen: str,
-        hrm_solve_fn=None
+        hrm_solve_fn=None,
+        hrm_solve_batch_fn=None
     ) -> ExecutionPlan:
         """
         Generate an execution plan for the given intent.
@@ -140,8 +272,12 @@ class Planner:
         Args:
             intent: Parsed user intent
             current_screen: Current screen ID on the Android device
-            hrm_solve_fn: Optional function(grid, width, height) → (path, success)
+            hrm_solve_fn: Optional function(grid, width, height) → (path, success),
+                          called with the maze's raw token bytes
                           If None, uses BFS fallback
+            hrm_solve_batch_fn: Optional function([(grid, width, height), ...])
+                          → [(path, success), ...]; solves every transition's
+                          maze in one call and takes precedence over hrm_solve_fn
         
         Returns:
             ExecutionPlan with concrete action steps
@@ -152,33 +288,57 @@ class Planner:
         checkpoints = self._resolve_checkpoints(intent, current_screen)
         logger.info(f"Checkpoints: {' → '.join(checkpoints)}")
 
+        transitions = [
+            (from_screen, to_screen)
+            for from_screen, to_screen in zip(checkpoints, checkpoints[1:])
+            if from_screen != to_screen
+        ]
+
+        # Already there (e.g. check_balance on home): nothing to compile or solve
+        if not transitions:
+            logger.info("Plan generated: 0 steps, ~0ms")
+            return ExecutionPlan(
+                intent=intent,
+                checkpoints=checkpoints,
+                summary=self._build_summary(intent),
+                requires_confirmation=self._needs_confirmation(intent)
+            )
+
         # Build execution steps
         steps = []
         step_index = 0
 
-        for i in range(len(checkpoints) - 1):
-            from_screen = checkpoints[i]
-            to_screen = checkpoints[i + 1]
-
-            if from_screen == to_screen:
-                continue
-
-            # Compile maze for this transition
-            try:
-                maze_result = self.compiler.compile(self.graph, from_screen, to_screen)
-            except ValueError as e:
-                logger.error(f"Failed to compile maze {from_screen} → {to_screen}: {e}")
+        # Compile every transition's maze in one pass (shared layout / tracing)
+        mazes = self.compiler.compile_many(self.graph, transitions)
+
+        # Hops don't depend on each other, so one HRM batch solves them all
+        solved = {}
+        if hrm_solve_batch_fn:
+            compiled = [k for k, m in enumerate(mazes) if not isinstance(m, ValueError)]
+            if compiled:
+                solutions = hrm_solve_batch_fn([
+                    (mazes[k]["grid_bytes"], mazes[k]["width"], mazes[k]["height"])
+                    for k in compiled
+                ])
+                solved = dict(zip(compiled, solutions))
+
+        for k, ((from_screen, to_screen), maze_result) in enumerate(zip(transitions, mazes)):
+            if isinstance(maze_result, ValueError):
+                logger.error(f"Failed to compile maze {from_screen} → {to_screen}: {maze_result}")
                 continue
 
             # Solve with HRM or BFS fallback
             path_nodes = []
 
-            if hrm_solve_fn:
-                path, success = hrm_solve_fn(
-                    maze_result["grid"],
-                    maze_result["width"],
-                    maze_result["height"]
-                )
+            if hrm_solve_batch_fn or hrm_solve_fn:
+                if hrm_solve_batch_fn:
+                    path, success = solved[k]
+                else:
+                    path, success = hrm_solve_fn(
+                        maze_result["grid_bytes"],
+                        maze_result["width"],
+                        maze_result["height"]
+                    )
                 if success and path:
                     # Decode HRM grid path back to node sequence
                     path_nodes = self.compiler.decode_hrm_path(
@@ -237,46 +397,184 @@ class Planner:
         if intent.name == "send_money" and intent.params.get("source", "").startswith("bolsillo"):
             intent_key = "send_money_from_pocket"
 
-        checkpoints = INTENT_CHECKPOINTS.get(intent_key, [])
+        checkpoints = RESOLVED_CHECKPOINTS.get(intent_key)
 
         if not checkpoints:
             logger.warning(f"No checkpoint sequence for intent: {intent.name}")
             return [current_screen]
 
-        # Prepend current screen if not already the first checkpoint
-        if checkpoints[0] != current_screen:
-            checkpoints = [current_screen] + checkpoints
+        if checkpoints[0] == current_screen:
+            return list(checkpoints)
 
-        # Remove duplicates while preserving order
-        seen = set()
-        deduped = []
-        for cp in checkpoints:
-            if cp not in seen or cp == "home":  # Allow revisiting home
-                seen.add(cp)
-                deduped.append(cp)
-
-        return deduped
+        # Prepend current screen, dropping its later visits (home may be revisited)
+        return [current_screen] + [
+            cp for cp in checkpoints if cp != current_screen or cp == "home"
+        ]
 
     def _bfs_graph_path(self, start: str, target: str) -> List[str]:
-        """BFS on the graph to find node sequence (fallback when HRM unavailable)"""
-        from collections import deque
-
-        queue = deque([(start, [start])])
-        visited = {start}
-
-        while queue:
-            current, path = queue.popleft()
-
-            if current == target:
-                return path
+        """
+        Find node sequence on the graph (fallback when HRM unavailable).
+        Small graphs walk a precomputed next-hop table; otherwise paths are
+        searched and memoized on the graph, which drops both when re-indexed.
+        """
+        if self.graph._adj is None:
+            self.graph.build_index()
+        if start == target:
+            return [start]
+
+        next_hop = self._next_hop_table()
+        if next_hop is not None and start in next_hop:
+            path = [start]
+            node = start
+            while node != target:
+                node = next_hop[node].get(target)
+                if node is None:
+                    return []  # Unreachable
+                path.append(node)
+            return path
+
+        path = self.graph._paths.get((start, target))
+        if path is None:
+            if HAS_NUMBA and start in self.graph.nodes:
+                path = self._csr_bfs(start, target)
+            else:
+                path = self._bidirectional_bfs(start, target)
+            self.graph._paths[(start, target)] = path
+        return list(path)
+
+    def _csr_bfs(self, start: str, target: str) -> List[str]:
+        """Compiled bidirectional BFS over the graph's CSR adjacency (start must be a node)"""
+        graph = self.graph
+        if target not in graph.nodes:
+            return []
+
+        if graph._csr is None:
+            node_index = graph.node_index
+            csr = []
+            # Rows keep get_neighbors / get_predecessors order, so ties break as in _bidirectional_bfs
+            for expand in (graph.get_neighbors, graph.get_predecessors):
+                indptr = [0]
+                indices = []
+                for node_id in graph.nodes:
+                    indices.extend(node_index[other] for other in expand(node_id) if other in node_index)
+                    indptr.append(len(indices))
+                csr.extend((np.array(indptr, dtype=np.int32), np.array(indices, dtype=np.int32)))
+            graph._csr = (*csr, list(graph.nodes))
+
+        indptr, indices, rindptr, rindices, node_ids = graph._csr
+        path = bidirectional_bfs_csr(
+            indptr, indices, rindptr, rindices, graph.node_index[start], graph.node_index[target]
+        )
+        return [node_ids[i] for i in path.tolist()]
 
-            for neighbor in self.graph.get_neighbors(current):
-                if neighbor not in visited and neighbor in self.graph.nodes:
-                    visited.add(neighbor)
-                    queue.append((neighbor, path + [neighbor]))
+    def _next_hop_table(self) -> Optional[Dict[str, Dict[str, str]]]:
+        """
+        All-pairs first steps along shortest paths, one BFS per node, built
+        once per graph. None for graphs over NEXT_HOP_MAX_NODES.
+        """
+        graph = self.graph
+        if graph._next_hop is None and len(graph.nodes) <= NEXT_HOP_MAX_NODES:
+            from collections import deque
+
+            nodes = graph.nodes
+            table: Dict[str, Dict[str, str]] = {}
+            for source in nodes:
+                # first[t] = the neighbour of source that the BFS reached t through
+                first: Dict[str, str] = {}
+                queue = deque()
+                for neighbor in graph.get_neighbors(source):
+                    if neighbor not in first and neighbor != source and neighbor in nodes:
+                        first[neighbor] = neighbor
+                        queue.append(neighbor)
+
+                while queue:
+                    current = queue.popleft()
+                    step = first[current]
+                    for neighbor in graph.get_neighbors(current):
+                        if neighbor not in first and neighbor != source and neighbor in nodes:
+                            first[neighbor] = step
+                            queue.append(neighbor)
+
+                table[source] = first
+            graph._next_hop = table
+
+        return graph._next_hop
+
+    def _bidirectional_bfs(self, start: str, target: str) -> List[str]:
+        """
+        Bidirectional BFS: expands whichever frontier is smaller one full
+        level at a time, forward along edges from start and backward along
+        edges into target, and stitches the halves where they meet.
+        """
+        if start == target:
+            return [start]
+
+        nodes = self.graph.nodes
+        if target not in nodes:
+            return []
+
+        # Parent pointers double as the visited sets of each side
+        fwd_parent: Dict[str, Optional[str]] = {start: None}
+        bwd_parent: Dict[str, Optional[str]] = {target: None}
+        fwd_frontier = [start]
+        bwd_frontier = [target]
+
+        while fwd_frontier and bwd_frontier:
+            forward = len(fwd_frontier) <= len(bwd_frontier)
+            if forward:
+                frontier, parent, other = fwd_frontier, fwd_parent, bwd_parent
+                expand = self.graph.get_neighbors
+            else:
+                frontier, parent, other = bwd_frontier, bwd_parent, fwd_parent
+                expand = self.graph.get_predecessors
+
+            next_frontier = []
+            meeting = None
+            for current in frontier:
+                for neighbor in expand(current):
+                    if neighbor in parent:
+                        continue
+                    # The start itself needn't be a graph node
+                    if neighbor not in nodes and neighbor != start:
+                        continue
+                    parent[neighbor] = current
+                    if neighbor in other:
+                        meeting = neighbor
+                        break
+                    next_frontier.append(neighbor)
+                if meeting is not None:
+                    break
+
+            if meeting is not None:
+                return self._stitch_path(fwd_parent, bwd_parent, meeting)
+
+            if forward:
+                fwd_frontier = next_frontier
+            else:
+                bwd_frontier = next_frontier
 
         return []
 
+    @staticmethod
+    def _stitch_path(
+        fwd_parent: Dict[str, Optional[str]],
+        bwd_parent: Dict[str, Optional[str]],
+        meeting: str
+    ) -> List[str]:
+        """Join the start → meeting and meeting → target halves of a bidirectional search"""
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = fwd_parent[node]
+        path.reverse()
+
+        node = bwd_parent[meeting]
+        while node is not None:
+            path.append(node)
+            node = bwd_parent[node]
+        return path
+
     def _build_action_step(
         self,
         index: int,
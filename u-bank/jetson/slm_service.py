@@ -16,10 +16,23 @@ Uses llama-cpp-python for efficient inference on Jetson CUDA.
 import json
 import logging
 import os
+import re
 import time
+import unicodedata
+from collections import OrderedDict
 from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
 
+# orjson parses the LLM's JSON in C; stdlib json otherwise.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError.
+try:
+    import orjson
+    json_loads = orjson.loads
+    HAS_ORJSON = True
+except ImportError:
+    json_loads = json.loads
+    HAS_ORJSON = False
+
 logger = logging.getLogger('SLMService')
 
 # ============================================
@@ -31,6 +44,9 @@ SLM_MODEL_PATH = os.environ.get(
     os.path.expanduser('~/.cache/u-bank/models/gemma-2-2b-it-Q4_K_M.gguf')
 )
 
+# Recent utterances whose extracted intent is kept (users repeat phrases)
+INTENT_CACHE_SIZE = 128
+
 # System prompt for banking NLU
 SYSTEM_PROMPT = """Eres el módulo NLU de Ü, un asistente bancario inteligente para Bancolombia.
 Tu trabajo es extraer la intención del usuario a partir de su mensaje de voz en español.
@@ -73,6 +89,96 @@ AMOUNT_PATTERNS = {
     "palos": 1000000,
 }
 
+# Amount regexes with their extractors, tried in order (first match wins)
+# "50 mil" → 50000, "un millón" → 1000000
+AMOUNT_REGEXES = [
+    (re.compile(r'(\d+)\s*mil'), lambda m: int(m.group(1)) * 1000),
+    (re.compile(r'(\d+)\s*mill[oó]n(?:es)?'), lambda m: int(m.group(1)) * 1000000),
+    (re.compile(r'(\d+)\s*lucas?'), lambda m: int(m.group(1)) * 1000),
+    (re.compile(r'(\d+)\s*palos?'), lambda m: int(m.group(1)) * 1000000),
+    (re.compile(r'\$\s*([\d,.]+)'), lambda m: int(m.group(1).replace(',', '').replace('.', ''))),
+    (re.compile(r'(\d{4,})'), lambda m: int(m.group(1))),  # Raw number >= 1000
+]
+
+# Every amount regex needs a digit: one scan rules them all out
+AMOUNT_DIGIT_REGEX = re.compile(r'\d')
+
+# "a [Name]" where Name is capitalized: "Envía 50 mil a María" → "María"
+RECIPIENT_REGEX = re.compile(r'\ba\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)*)')
+
+# Capitalized words that follow "a" but aren't recipients
+RECIPIENT_SKIP_WORDS = frozenset({"Bancolombia", "Nequi", "Daviplata", "Cuenta", "Bolsillo"})
+
+
+def _fold_accents(text: str) -> str:
+    """Drop combining marks (accents): envía → envia, cuánto → cuanto"""
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def _keyword_regex(keywords) -> re.Pattern:
+    """One alternation that matches any of the keywords as a substring of folded text"""
+    folded = dict.fromkeys(_fold_accents(kw) for kw in keywords)  # Accent variants collapse
+    return re.compile('|'.join(map(re.escape, folded)))
+
+
+# Rule-based intent keywords, one regex per category (matched against NormalizedText.folded)
+SEND_KEYWORDS_RE = _keyword_regex(["envía", "envia", "enviar", "transfiere", "transferir",
+                                   "manda", "mandar", "pasa", "pasar", "gira", "girar"])
+BALANCE_KEYWORDS_RE = _keyword_regex(["saldo", "cuánto tengo", "cuanto tengo", "balance",
+                                      "plata tengo", "dinero tengo"])
+PAY_KEYWORDS_RE = _keyword_regex(["paga", "pagar", "servicio", "factura", "recibo"])
+POCKET_KEYWORDS_RE = _keyword_regex(["bolsillo", "pocket", "ahorro"])
+
+
+@dataclass(frozen=True)
+class NormalizedText:
+    """An utterance normalized once at extract_intent entry, in the forms the extractors use"""
+    text: str      # NFKC, stripped; case kept for recipient names
+    lower: str     # Casefolded, for amounts
+    folded: str    # Casefolded without accents, for keywords
+
+    @classmethod
+    def of(cls, text: str) -> "NormalizedText":
+        text = unicodedata.normalize('NFKC', text).strip()
+        lower = text.casefold()
+        return cls(text=text, lower=lower, folded=_fold_accents(lower))
+
+
+# ============================================
+# Streamed JSON
+# ============================================
+
+class _JsonObjectTracker:
+    """
+    Follows the brace depth of JSON text fed piece by piece (braces inside
+    strings don't count), to tell when the top-level object has closed.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, piece: str) -> int:
+        """Index just past the object's closing brace within piece, or -1"""
+        for i, ch in enumerate(piece):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == '{':
+                self.depth += 1
+            elif ch == '}' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    return i + 1
+        return -1
+
 
 # ============================================
 # SLM Wrapper
@@ -88,6 +194,9 @@ class SLMService:
         self.model_path = model_path
         self.llm = None
         self.loaded = False
+        # normalized text → LLM {"intent", "confidence", "params"}; rule-based
+        # results aren't kept, so a failed parse is retried next time
+        self._intent_cache: OrderedDict = OrderedDict()
 
     def load(self) -> bool:
         """Load the SLM model"""
@@ -122,12 +231,14 @@ class SLMService:
             logger.error(f"Failed to load SLM: {e}")
             return False
 
-    def extract_intent(self, text: str) -> Dict[str, Any]:
+    def extract_intent(self, text: str, bypass_cache: bool = False) -> Dict[str, Any]:
         """
         Extract structured intent from user speech text.
         
         Args:
             text: Transcribed user speech (Spanish)
+            bypass_cache: Always run extraction, without reading or filling
+                          the cache of recent utterances
             
         Returns:
             {
@@ -140,12 +251,26 @@ class SLMService:
         """
         start = time.time()
 
-        if self.llm and self.loaded:
-            result = self._llm_extract(text)
+        norm = NormalizedText.of(text)
+        # Case is kept: recipients are recognised by their capital letter
+        key = norm.text
+        cached = None if bypass_cache else self._intent_cache.get(key)
+
+        if cached is not None:
+            self._intent_cache.move_to_end(key)
+            result = {**cached, "params": dict(cached["params"])}
         else:
-            # Fallback: rule-based extraction
-            logger.warning("SLM not loaded, using rule-based extraction")
-            result = self._rule_based_extract(text)
+            result = None
+            if self.llm and self.loaded:
+                result = self._llm_extract(norm)
+                if result is None:
+                    result = self._rule_based_extract(norm)
+                elif not bypass_cache:
+                    self._cache_intent(key, result)
+            else:
+                # Fallback: rule-based extraction
+                logger.warning("SLM not loaded, using rule-based extraction")
+                result = self._rule_based_extract(norm)
 
         result["raw_text"] = text
         result["inference_time_ms"] = int((time.time() - start) * 1000)
@@ -158,67 +283,83 @@ class SLMService:
 
         return result
 
-    def _llm_extract(self, text: str) -> Dict[str, Any]:
-        """Extract intent using the LLM"""
+    def _cache_intent(self, key: str, result: Dict[str, Any]):
+        # Copies, so callers can't modify the cached entry
+        self._intent_cache[key] = {**result, "params": dict(result["params"])}
+        if len(self._intent_cache) > INTENT_CACHE_SIZE:
+            self._intent_cache.popitem(last=False)
+
+    def _llm_extract(self, norm: NormalizedText) -> Optional[Dict[str, Any]]:
+        """Extract intent using the LLM (None if its output can't be parsed)"""
         try:
-            response = self.llm.create_chat_completion(
+            stream = self.llm.create_chat_completion(
                 messages=[
                     {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": text}
+                    {"role": "user", "content": norm.text}
                 ],
                 max_tokens=256,
                 temperature=0.1,  # Low temperature for deterministic output
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                stream=True
             )
 
-            content = response["choices"][0]["message"]["content"]
-            parsed = json.loads(content)
-
+            # Stop generating as soon as the JSON object is complete; if it
+            # never closes, the whole output goes to the parser as before
+            tracker = _JsonObjectTracker()
+            pieces = []
+            try:
+                for chunk in stream:
+                    piece = chunk["choices"][0]["delta"].get("content") or ""
+                    end = tracker.feed(piece)
+                    if end >= 0:
+                        pieces.append(piece[:end])
+                        break
+                    pieces.append(piece)
+            finally:
+                stream.close()  # Abandons the rest of the generation
+
+            content = "".join(pieces)
+            parsed = json_loads(content)
+
+            params = parsed.get("params")
             return {
                 "intent": parsed.get("intent", "unknown"),
                 "confidence": parsed.get("confidence", 0.5),
-                "params": parsed.get("params", {})
+                # Valid JSON can still carry null/str/list params
+                "params": params if isinstance(params, dict) else {}
             }
 
         except (json.JSONDecodeError, KeyError, IndexError) as e:
             logger.error(f"Failed to parse LLM response: {e}")
-            return self._rule_based_extract(text)
+            return None
 
-    def _rule_based_extract(self, text: str) -> Dict[str, Any]:
+    def _rule_based_extract(self, norm: NormalizedText) -> Dict[str, Any]:
         """
         Rule-based intent extraction fallback.
         Works without LLM for testing and when model isn't loaded.
         """
-        text_lower = text.lower().strip()
-
         # Detect intent
         intent = "unknown"
         confidence = 0.6
         params = {}
 
         # Send money patterns
-        send_keywords = ["envía", "envia", "enviar", "transfiere", "transferir",
-                         "manda", "mandar", "pasa", "pasar", "gira", "girar"]
-        if any(kw in text_lower for kw in send_keywords):
+        if SEND_KEYWORDS_RE.search(norm.folded):
             intent = "send_money"
             confidence = 0.85
 
         # Check balance
-        balance_keywords = ["saldo", "cuánto tengo", "cuanto tengo", "balance",
-                           "plata tengo", "dinero tengo"]
-        if any(kw in text_lower for kw in balance_keywords):
+        if BALANCE_KEYWORDS_RE.search(norm.folded):
             intent = "check_balance"
             confidence = 0.9
 
         # Pay bill
-        pay_keywords = ["paga", "pagar", "servicio", "factura", "recibo"]
-        if any(kw in text_lower for kw in pay_keywords):
+        if PAY_KEYWORDS_RE.search(norm.folded):
             intent = "pay_bill"
             confidence = 0.8
 
         # Pocket operations
-        pocket_keywords = ["bolsillo", "pocket", "ahorro"]
-        if any(kw in text_lower for kw in pocket_keywords):
+        if POCKET_KEYWORDS_RE.search(norm.folded):
             if intent == "send_money":
                 params["source"] = "bolsillo_ahorros"
             else:
@@ -226,12 +367,12 @@ class SLMService:
                 confidence = 0.8
 
         # Extract amount
-        amount = self._extract_amount(text_lower)
+        amount = self._extract_amount(norm.lower)
         if amount:
             params["amount"] = amount
 
         # Extract recipient (simple: word after "a" that's capitalized in original)
-        recipient = self._extract_recipient(text)
+        recipient = self._extract_recipient(norm.text)
         if recipient:
             params["recipient"] = recipient
 
@@ -243,26 +384,14 @@ class SLMService:
 
     def _extract_amount(self, text: str) -> Optional[int]:
         """Extract monetary amount from Spanish text"""
-        import re
-
-        # Pattern: number + mil/millón
-        # "50 mil" → 50000, "un millón" → 1000000
-        patterns = [
-            (r'(\d+)\s*mil', lambda m: int(m.group(1)) * 1000),
-            (r'(\d+)\s*mill[oó]n(?:es)?', lambda m: int(m.group(1)) * 1000000),
-            (r'(\d+)\s*lucas?', lambda m: int(m.group(1)) * 1000),
-            (r'(\d+)\s*palos?', lambda m: int(m.group(1)) * 1000000),
-            (r'\$\s*([\d,.]+)', lambda m: int(m.group(1).replace(',', '').replace('.', ''))),
-            (r'(\d{4,})', lambda m: int(m.group(1))),  # Raw number >= 1000
-        ]
-
-        for pattern, extractor in patterns:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    return extractor(match)
-                except (ValueError, IndexError):
-                    continue
+        if AMOUNT_DIGIT_REGEX.search(text):
+            for regex, extractor in AMOUNT_REGEXES:
+                match = regex.search(text)
+                if match:
+                    try:
+                        return extractor(match)
+                    except (ValueError, IndexError):
+                        continue
 
         # Special: "un millón" without number
         if "un mill" in text:
@@ -272,16 +401,11 @@ class SLMService:
 
     def _extract_recipient(self, text: str) -> Optional[str]:
         """Extract recipient name from text"""
-        import re
-
-        # Look for "a [Name]" pattern where Name is capitalized
-        # "Envía 50 mil a María" → "María"
-        match = re.search(r'\ba\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)*)', text)
+        match = RECIPIENT_REGEX.search(text)
         if match:
             name = match.group(1)
             # Filter out common non-name words
-            skip_words = {"Bancolombia", "Nequi", "Daviplata", "Cuenta", "Bolsillo"}
-            if name not in skip_words:
+            if name not in RECIPIENT_SKIP_WORDS:
                 return name
 
         return None
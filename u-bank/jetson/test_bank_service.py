@@ -0,0 +1,71 @@
+"""
+Tests for BankService message handling.
+
+Run from this directory: python -m unittest
+"""
+
+import logging
+import unittest
+
+from bank_service import BankService
+
+logging.disable(logging.CRITICAL)
+
+
+class FakeWebSocket:
+    """Collects the frames BankService sends"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(frame)
+
+
+class NullPayloadFieldTest(unittest.IsolatedAsyncioTestCase):
+    """JSON null in an id field must not break the handler (sys.intern only takes str)"""
+
+    def setUp(self):
+        self.service = BankService('ws://localhost:0')
+        self.service.ws = FakeWebSocket()
+
+    async def test_voice_command_null_request_id_and_app(self):
+        await self.service._handle_voice_command({
+            'type': 'voice_command',
+            'requestId': None,
+            'payload': {'text': 'consulta mi saldo', 'app': None},
+        })
+        # intent_confirmed, then explore_request (no graph for the app yet)
+        self.assertEqual(len(self.service.ws.sent), 2)
+        self.assertIn(b'"requestId":"vc-', self.service.ws.sent[0])
+        self.assertIn(b'"app":"com.bancolombia.app"', self.service.ws.sent[1])
+
+    async def test_graph_update_null_app(self):
+        await self.service._handle_graph_update({
+            'type': 'graph_update',
+            'payload': {'app': None, 'graph': {'nodes': {}}},
+        })
+        self.assertEqual(self.service.app_graphs, {})
+
+    async def test_ui_state_null_fields(self):
+        await self.service._handle_ui_state({
+            'type': 'ui_state',
+            'payload': {'currentApp': None, 'screenFingerprint': None},
+        })
+        await self.service._handle_ui_state({
+            'type': 'ui_state',
+            'payload': {'currentApp': 'com.bancolombia.app', 'screenFingerprint': None},
+        })
+        self.assertEqual(self.service.current_screen, {})
+
+    async def test_action_result_null_screen(self):
+        await self.service._handle_action_result({
+            'type': 'action_result',
+            'requestId': None,
+            'payload': {'stepIndex': 0, 'success': True, 'newScreenFingerprint': None},
+        })
+        self.assertEqual(self.service.ws.sent, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
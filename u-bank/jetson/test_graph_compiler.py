@@ -0,0 +1,48 @@
+"""
+Tests for graph_compiler helpers.
+
+Run from this directory: python -m unittest
+"""
+
+import logging
+import unittest
+
+from graph_compiler import load_graph_from_json, visualize_grid
+
+logging.disable(logging.CRITICAL)
+
+
+class VisualizeGridTest(unittest.TestCase):
+    """Debug rendering never raises on odd grids"""
+
+    def test_known_tokens_and_labels(self):
+        grid = [[0, 1, 2], [3, 4, 5]]
+        self.assertEqual(visualize_grid(grid, {"home": (0, 1)}), "█HS\nT★✗")
+
+    def test_unknown_tokens_render_as_question_mark(self):
+        self.assertEqual(visualize_grid([[-1, 1, 300, 6]]), "?·??")
+
+    def test_ragged_rows(self):
+        self.assertEqual(visualize_grid([[0, 1], [1], [0, 1, 9]]), "█·\n·\n█·?")
+
+
+class LoadGraphTest(unittest.TestCase):
+    """IDs are interned when they're strings and accepted as-is otherwise"""
+
+    def test_numeric_ids(self):
+        graph = load_graph_from_json({
+            "nodes": {"home": {"edges": [2]}},
+            "edges": [{"from": "home", "to": 2}, {"from": 2, "to": "home"}],
+        })
+        self.assertEqual(graph.nodes["home"].edges, [2])
+        self.assertEqual([(e.from_node, e.to_node) for e in graph.edges],
+                         [("home", 2), (2, "home")])
+
+    def test_string_ids_are_interned(self):
+        node_id = "".join(["ho", "me"])  # Not a compile-time constant
+        graph = load_graph_from_json({"nodes": {node_id: {}}})
+        self.assertIs(next(iter(graph.nodes)), "home")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Tests for SLMService intent extraction.
+
+Run from this directory: python -m unittest
+"""
+
+import logging
+import unittest
+
+from slm_service import SLMService
+
+logging.disable(logging.CRITICAL)
+
+
+class FakeLlama:
+    """Streams a canned reply and counts completions"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def create_chat_completion(self, **kwargs):
+        self.calls += 1
+        return self._stream()
+
+    def _stream(self):
+        # A generator, like llama-cpp's own stream (has .close())
+        yield {"choices": [{"delta": {"content": self.reply}}]}
+
+
+class IntentCacheTest(unittest.TestCase):
+    """Only intents the LLM actually produced are cached"""
+
+    def _service(self, reply):
+        service = SLMService()
+        service.llm = FakeLlama(reply)
+        service.loaded = True
+        return service
+
+    def test_llm_result_is_cached(self):
+        service = self._service(
+            '{"intent": "check_balance", "confidence": 0.9, "params": {}}')
+        first = service.extract_intent("consulta mi saldo")
+        second = service.extract_intent("consulta mi saldo")
+        self.assertEqual(service.llm.calls, 1)
+        self.assertEqual(first["intent"], "check_balance")
+        self.assertEqual(second["intent"], "check_balance")
+
+    def test_parse_failure_falls_back_without_caching(self):
+        service = self._service('not json')
+        result = service.extract_intent("consulta mi saldo")
+        self.assertEqual(result["intent"], "check_balance")  # rule-based
+        service.extract_intent("consulta mi saldo")
+        self.assertEqual(service.llm.calls, 2)
+        self.assertEqual(len(service._intent_cache), 0)
+
+    def test_non_dict_params_become_empty(self):
+        for params in ('null', '"x"', '[1, 2]'):
+            with self.subTest(params=params):
+                service = self._service(
+                    '{"intent": "check_balance", "confidence": 0.9, '
+                    '"params": %s}' % params)
+                first = service.extract_intent("consulta mi saldo")
+                second = service.extract_intent("consulta mi saldo")  # cache hit
+                self.assertEqual(first["params"], {})
+                self.assertEqual(second["params"], {})
+                self.assertEqual(service.llm.calls, 1)
+
+    def test_rule_based_result_is_not_cached(self):
+        service = SLMService()  # not loaded
+        service.extract_intent("consulta mi saldo")
+        self.assertEqual(len(service._intent_cache), 0)
+
+
+class AccentFoldingTest(unittest.TestCase):
+    """Rule-based keywords match with or without (stray) accents"""
+
+    CASES = [
+        # Matched before accents were folded
+        ("cuanto tengo", "check_balance"),
+        ("cuánto tengo", "check_balance"),
+        ("mi saldo", "check_balance"),
+        ("envia", "send_money"),
+        ("envía", "send_money"),
+        ("transfiere 5 lucas", "send_money"),
+        ("paga la luz", "pay_bill"),
+        # Only match since folding
+        ("cuànto tengo", "check_balance"),
+        ("mi sáldo", "check_balance"),
+        ("transfiére 5 lucas", "send_money"),
+        ("Envíá 20 mil a Ana", "send_money"),
+        ("pagá la luz", "pay_bill"),
+    ]
+
+    def test_intents(self):
+        service = SLMService()
+        for text, intent in self.CASES:
+            with self.subTest(text=text):
+                result = service.extract_intent(text, bypass_cache=True)
+                self.assertEqual(result["intent"], intent)
+
+    def test_params_survive_folding(self):
+        # Recipient keeps its case and the amount still parses
+        result = SLMService().extract_intent("Envíá 20 mil a Ana", bypass_cache=True)
+        self.assertEqual(result["params"], {"amount": 20000, "recipient": "Ana"})
+
+
+if __name__ == '__main__':
+    unittest.main()